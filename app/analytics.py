@@ -1,13 +1,166 @@
 import time
+import math
 import requests
 import threading
+from array import array
 from .config import MEDIAMTX_API_PORT
 
+# Metrics recorded per path at every poll
+HISTORY_METRICS = ('bitrate', 'sendBitrate', 'readers', 'ready')
+
+
+class RingBuffer:
+    """Fixed-size columnar ring buffer of (timestamp, metric values...) samples"""
+    
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.columns = columns
+        self.times = array('d', bytes(8 * capacity))
+        self.values = {name: array('d', bytes(8 * capacity)) for name in columns}
+        self.head = 0   # Next slot to write
+        self.count = 0
+        
+    def append(self, timestamp, sample):
+        i = self.head
+        self.times[i] = timestamp
+        for name in self.columns:
+            self.values[name][i] = sample.get(name, 0)
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        
+    def oldest_time(self):
+        if not self.count:
+            return None
+        return self.times[(self.head - self.count) % self.capacity]
+        
+    def since(self, start_time):
+        """Return (times, {column: values}) for samples newer than start_time, oldest first"""
+        first = (self.head - self.count) % self.capacity
+        indices = [(first + k) % self.capacity for k in range(self.count)]
+        indices = [i for i in indices if self.times[i] >= start_time]
+        return ([self.times[i] for i in indices],
+                {name: [col[i] for i in indices] for name, col in self.values.items()})
+
+
+class PathHistory:
+    """
+    Per-path analytics history in fixed memory.
+    
+    The first tier stores every poll sample; each further tier stores one averaged
+    sample per bucket (plus the bucket's peak bitrate) so long ranges stay cheap.
+    """
+    
+    def __init__(self, tiers):
+        # tiers: [(resolution_seconds, span_seconds), ...], finest first
+        self.tiers = []
+        for resolution, span in tiers:
+            capacity = max(1, int(math.ceil(span / resolution)))
+            self.tiers.append({
+                'resolution': resolution,
+                'span': span,
+                'buffer': RingBuffer(capacity, HISTORY_METRICS + ('bitrateMax',)),
+                'bucket': None,  # Running aggregate for the current downsampled bucket
+            })
+        self.last_sample_time = 0
+        
+    def add(self, timestamp, sample):
+        self.last_sample_time = timestamp
+        self.tiers[0]['buffer'].append(timestamp, dict(sample, bitrateMax=sample['bitrate']))
+        
+        for tier in self.tiers[1:]:
+            bucket_start = timestamp - (timestamp % tier['resolution'])
+            bucket = tier['bucket']
+            if bucket and bucket['start'] != bucket_start:
+                self._flush(tier)
+                bucket = None
+            if bucket is None:
+                bucket = tier['bucket'] = {'start': bucket_start, 'n': 0, 'bitrateMax': 0,
+                                           'sums': dict.fromkeys(HISTORY_METRICS, 0.0)}
+            bucket['n'] += 1
+            bucket['bitrateMax'] = max(bucket['bitrateMax'], sample['bitrate'])
+            for name in HISTORY_METRICS:
+                bucket['sums'][name] += sample[name]
+                
+    def _flush(self, tier):
+        bucket = tier['bucket']
+        averaged = {name: total / bucket['n'] for name, total in bucket['sums'].items()}
+        averaged['bitrateMax'] = bucket['bitrateMax']
+        tier['buffer'].append(bucket['start'], averaged)
+        tier['bucket'] = None
+        
+    def query(self, range_seconds, now):
+        """Summarize the last range_seconds using the finest tier that covers the range"""
+        start_time = now - range_seconds
+        tier = self.tiers[-1]
+        for candidate in self.tiers:
+            if candidate['span'] >= range_seconds:
+                tier = candidate
+                break
+        times, values = tier['buffer'].since(start_time)
+        
+        stats = {}
+        for name in HISTORY_METRICS:
+            series = values[name]
+            # Peaks inside downsampled buckets are kept separately so spikes aren't averaged away
+            peaks = values['bitrateMax'] if name == 'bitrate' else series
+            stats[name] = _summarize(series, peaks)
+        
+        return {
+            'resolution': tier['resolution'],
+            'samples': len(times),
+            'stats': stats,
+            'points': [
+                {'time': t, 'bitrate': round(b, 1), 'bitrateMax': round(m, 1),
+                 'sendBitrate': round(sb, 1), 'readers': round(r, 2), 'ready': round(rd, 2)}
+                for t, b, m, sb, r, rd in zip(times, values['bitrate'], values['bitrateMax'],
+                                              values['sendBitrate'], values['readers'], values['ready'])
+            ]
+        }
+
+
+def _summarize(series, peaks):
+    """min/avg/max/p95 of a series (max and p95 taken over the bucket peaks)"""
+    if not series:
+        return {'min': 0, 'avg': 0, 'max': 0, 'p95': 0}
+    ordered = sorted(peaks)
+    p95 = ordered[min(len(ordered) - 1, int(math.ceil(0.95 * len(ordered))) - 1)]
+    return {
+        'min': round(min(series), 1),
+        'avg': round(sum(series) / len(series), 1),
+        'max': round(ordered[-1], 1),
+        'p95': round(p95, 1),
+    }
+
+
+def parse_range(value, default=3600):
+    """Parse a history range like '90', '15m', '6h' or '1d' into seconds"""
+    if not value:
+        return default
+    value = str(value).strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    try:
+        if value[-1] in units:
+            return int(float(value[:-1]) * units[value[-1]])
+        return int(float(value))
+    except (ValueError, IndexError, OverflowError):
+        # OverflowError: 'inf' and the like
+        return default
+
+
 class AnalyticsManager:
     """Polls MediaMTX API for real-time stream analytics"""
     
-    def __init__(self, poll_interval=3):
+    # History tiers: (resolution seconds, span seconds), finest first.
+    # A resolution of None means "every poll" (poll_interval).
+    HISTORY_TIERS = ((None, 3600), (60, 86400))
+    
+    def __init__(self, poll_interval=3, history_tiers=None):
         self.poll_interval = poll_interval
+        self.history_tiers = [(resolution or poll_interval, span)
+                              for resolution, span in (history_tiers or self.HISTORY_TIERS)]
+        self.history_span = max(span for _, span in self.history_tiers)
+        # { path_name: PathHistory }
+        self.path_history = {}
         self.data = {}
         self.last_poll_time = 0
         self.running = False
@@ -90,13 +243,33 @@ class AnalyticsManager:
             else:
                 analytics['last_recv_time'] = current_time
             
+            # Outgoing bitrate from the bytesSent counter
+            send_bitrate = 0
+            if name in self._history:
+                delta_sent = analytics['bytesSent'] - self._history[name].get('bytesSent', 0)
+                delta_time = current_time - self._history[name]['time']
+                if delta_time > 0 and delta_sent >= 0:
+                    send_bitrate = (delta_sent * 8) / (1024 * delta_time)
+            
             # Update history
             self._history[name] = {
                 'bytesReceived': analytics['bytesReceived'],
+                'bytesSent': analytics['bytesSent'],
                 'time': current_time,
                 'last_recv_time': analytics['last_recv_time']
             }
             
+            # Record time-series sample
+            with self._lock:
+                if name not in self.path_history:
+                    self.path_history[name] = PathHistory(self.history_tiers)
+                self.path_history[name].add(current_time, {
+                    'bitrate': analytics['bitrate'],
+                    'sendBitrate': send_bitrate,
+                    'readers': analytics['readers'],
+                    'ready': 1 if analytics['ready'] else 0,
+                })
+            
             # Health check: if no bytes for 10 seconds, it's 'stale'
             analytics['stale'] = (current_time - analytics['last_recv_time']) > 10
             
@@ -105,6 +278,11 @@ class AnalyticsManager:
         with self._lock:
             self.data = new_analytics
             self.last_poll_time = current_time
+            
+            # Forget paths that have been gone for longer than the history covers
+            for name in list(self.path_history):
+                if name not in new_analytics and current_time - self.path_history[name].last_sample_time > self.history_span:
+                    del self.path_history[name]
 
     def get_analytics(self):
         """Get the latest collected analytics data"""
@@ -120,3 +298,20 @@ class AnalyticsManager:
                 'readers': 0,
                 'tracks': []
             })
+
+    def get_history(self, path_name, range_seconds):
+        """Get min/avg/max/p95 and samples for a path over the last range_seconds"""
+        range_seconds = max(1, min(range_seconds, self.history_span))
+        with self._lock:
+            history = self.path_history.get(path_name)
+            if not history:
+                return None
+            result = history.query(range_seconds, time.time())
+        result['path'] = path_name
+        result['range'] = range_seconds
+        return result
+
+    def get_history_paths(self):
+        """Names of paths that have recorded history"""
+        with self._lock:
+            return sorted(self.path_history)
@@ -80,6 +80,9 @@ class VirtualONVIFCamera:
         self.assigned_ip = None
         self.network_mgr = LinuxNetworkManager() if LinuxNetworkManager.is_linux() else None
         
+        # Bumped on every config edit so cached ONVIF responses are re-rendered
+        self.config_version = 0
+        
         self.status = "stopped"
         self.flask_app = None
         self.flask_thread = None
@@ -99,16 +102,20 @@ class VirtualONVIFCamera:
         mac = f"02:{h[0:2]}:{h[2:4]}:{h[4:6]}:{h[6:8]}:{h[8:10]}"
         return mac.lower()
         
+    @property
+    def vnic_name(self):
+        """Name of this camera's virtual NIC (interface names are limited to 15 chars)"""
+        return f"vnic_{self.path_name[:10]}"
+    
     def start(self):
         """Mark camera as running and start ONVIF service"""
         self.status = "running"
         
         # Setup Virtual NIC if requested (Linux only)
         if self.use_virtual_nic and self.network_mgr:
-            vnic_name = f"vnic_{self.path_name[:10]}"
-            if self.network_mgr.create_macvlan(self.parent_interface, vnic_name, self.nic_mac):
+            if self.network_mgr.create_macvlan(self.parent_interface, self.vnic_name, self.nic_mac):
                 self.assigned_ip = self.network_mgr.setup_ip(
-                    vnic_name, 
+                    self.vnic_name, 
                     self.ip_mode, 
                     self.static_ip, 
                     self.netmask, 
@@ -123,17 +130,38 @@ class VirtualONVIFCamera:
         """Mark camera as stopped and cleanup networking"""
         self.status = "stopped"
         
+        # Stop answering WS-Discovery probes
+        if self.manager and getattr(self.manager, 'discovery', None):
+            self.manager.discovery.unregister(self.id)
+        
+        # Stop the snapshot frame grabber reading our stream
+        if self.manager and getattr(self.manager, 'snapshots', None):
+            self.manager.snapshots.stop_camera(self.id)
+        
+        # Release the port on the shared ONVIF server (it is re-bound on start)
+        shared_server = self._get_shared_onvif_server()
+        if shared_server:
+            shared_server.remove_camera(self.id)
+        
         # Cleanup Virtual NIC
         if self.use_virtual_nic and self.network_mgr:
-            vnic_name = f"vnic_{self.path_name[:10]}"
-            self.network_mgr.remove_interface(vnic_name)
+            self.network_mgr.remove_interface(self.vnic_name)
             self.assigned_ip = None
         
+    def _get_shared_onvif_server(self):
+        """Get the manager's shared ONVIF server if shared mode is enabled"""
+        return getattr(self.manager, 'onvif_server', None) if self.manager else None
+        
     def _start_onvif_service(self):
         """Start the ONVIF web service"""
+        shared_server = self._get_shared_onvif_server()
+        
         # Check if already running
-        if self.flask_thread and self.flask_thread.is_alive():
+        if not shared_server and self.flask_thread and self.flask_thread.is_alive():
             print(f"  ONVIF service already running on port {self.onvif_port}")
+            # Discovery is stopped with the camera, so re-announce it
+            local_ip = self.assigned_ip if self.assigned_ip else socket.gethostbyname(socket.gethostname())
+            self.onvif_service.start_discovery_service(local_ip)
             return
             
         self.onvif_service = ONVIFService(self)
@@ -143,6 +171,23 @@ class VirtualONVIFCamera:
         # Use assigned IP if available, otherwise 0.0.0.0
         bind_ip = self.assigned_ip if self.assigned_ip else '0.0.0.0'
         
+        if shared_server:
+            # One event loop and worker pool serve every camera
+            shared_server.add_camera(self, app, bind_ip)
+        else:
+            self._start_dedicated_server(app, bind_ip)
+        
+        # Start WS-Discovery
+        # Use assigned IP for discovery if virtual NIC is active
+        local_ip = self.assigned_ip if self.assigned_ip else socket.gethostbyname(socket.gethostname())
+        
+        self.onvif_service.start_discovery_service(local_ip)
+        
+        print(f"  ONVIF service started on port {self.onvif_port}")
+        print(f"  Add manually in ODM: {local_ip}:{self.onvif_port}\n")
+        
+    def _start_dedicated_server(self, app, bind_ip):
+        """Start a dedicated thread-pooled WSGI server for this camera"""
         # Create server with thread pool to prevent thread exhaustion
         server = make_server(
             bind_ip,
@@ -167,15 +212,6 @@ class VirtualONVIFCamera:
         )
         self.flask_thread.start()
         
-        # Start WS-Discovery
-        # Use assigned IP for discovery if virtual NIC is active
-        local_ip = self.assigned_ip if self.assigned_ip else socket.gethostbyname(socket.gethostname())
-        
-        self.onvif_service.start_discovery_service(local_ip)
-        
-        print(f"  ONVIF service started on port {self.onvif_port}")
-        print(f"  Add manually in ODM: {local_ip}:{self.onvif_port}\n")
-        
     def to_dict(self):
         """Convert to dictionary for API"""
         return {
@@ -209,6 +245,7 @@ class VirtualONVIFCamera:
             'netmask': self.netmask,
             'gateway': self.gateway,
             'assignedIp': self.assigned_ip,
+            'dhcpLease': self.network_mgr.get_dhcp_lease(self.vnic_name) if self.use_virtual_nic and self.network_mgr else None,
             'macAddress': self.mac_address,
             'debugMode': self.debug_mode
         }
@@ -0,0 +1,74 @@
+import threading
+
+
+class CameraRegistry:
+    """
+    Ordered collection of cameras indexed by id and ONVIF port.
+
+    Iterates like the plain list it replaces (in insertion order, over a snapshot,
+    so callers may add or remove cameras while looping). All changes go through
+    add/remove/reindex/clear under the shared lock, so the indexes never disagree.
+    Call reindex() with the old port after changing a camera's onvif_port.
+    """
+
+    def __init__(self, lock=None):
+        self._lock = lock or threading.RLock()
+        self._by_id = {}        # Insertion ordered, doubles as the camera list
+        self._by_port = {}
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._by_id.values()))
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __bool__(self):
+        return bool(self._by_id)
+
+    def __contains__(self, camera):
+        return self._by_id.get(getattr(camera, 'id', None)) is camera
+
+    def add(self, camera):
+        with self._lock:
+            previous = self._by_id.get(camera.id)
+            if previous is not None:
+                self._unindex(previous, previous.onvif_port)
+            self._by_id[camera.id] = camera
+            self._by_port[camera.onvif_port] = camera
+
+    # List compatibility for code that still appends
+    append = add
+
+    def remove(self, camera):
+        with self._lock:
+            if self._by_id.get(camera.id) is camera:
+                del self._by_id[camera.id]
+                self._unindex(camera, camera.onvif_port)
+
+    def reindex(self, camera, old_port):
+        """Move a camera from its old ONVIF port entry to its current one"""
+        with self._lock:
+            if self._by_id.get(camera.id) is camera:
+                self._unindex(camera, old_port)
+                self._by_port[camera.onvif_port] = camera
+
+    def clear(self):
+        with self._lock:
+            self._by_id.clear()
+            self._by_port.clear()
+
+    def get(self, camera_id):
+        return self._by_id.get(camera_id)
+
+    def get_by_port(self, onvif_port):
+        return self._by_port.get(onvif_port)
+
+    def _unindex(self, camera, port):
+        if self._by_port.get(port) is camera:
+            del self._by_port[port]
+            # Another camera sharing the port (e.g. a hand-edited config) takes over
+            for other in self._by_id.values():
+                if other.onvif_port == port and other is not camera:
+                    self._by_port[port] = other
+                    break
@@ -0,0 +1,213 @@
+# FFmpeg filter graphs for GridFusion composite streams.
+#
+# A layout's tiles are placed with a single xstack pass when they do not overlap and
+# fit on the canvas (grid layouts, including anything built with snap-to-grid), so
+# each output frame is assembled once. Free-form or overlapping tiles fall back to
+# the chain of overlays on a black canvas, which also honours always-on-top order.
+#
+# Several layouts can also be built into one graph that opens every source once and
+# fans it out with split, so a camera shown in N layouts is decoded once, not N times.
+#
+# The scale and overlay filters of overlay graphs are named after their tile, so a
+# running graph can be moved and resized through filter commands (a zmq socket for
+# live edits, plus a sendcmd file that re-applies the last geometry when FFmpeg is
+# restarted with its original command line).
+
+# xstack's fill option (black gaps between/around tiles) needs FFmpeg 5.0+
+XSTACK_FILL_VERSION = (5, 0, 0)
+
+# Sources running at least this many times the output rate skip non-reference frames
+SKIP_FRAME_RATIO = 2
+
+
+def pick_stream(stream_type, tile, camera):
+    """
+    'main' or 'sub' for a tile. 'auto' (or unset) takes the sub stream when its
+    configured resolution covers the tile, so small tiles never decode the main stream.
+    """
+    if stream_type in ('main', 'sub'):
+        return stream_type
+    sub_w = int(getattr(camera, 'sub_width', 0) or 0)
+    sub_h = int(getattr(camera, 'sub_height', 0) or 0)
+    return 'sub' if sub_w >= tile['w'] and sub_h >= tile['h'] else 'main'
+
+
+def decode_options(source_fps, output_fps):
+    """
+    Input options letting the decoder drop frames the composite never shows.
+
+    Non-reference frames are skipped when the source runs well above the output
+    rate; the fps filter in the graph then picks frames from what is left. Skipping
+    to keyframes only is not done, as it depends on the camera's GOP length.
+    """
+    try:
+        ratio = float(source_fps) / float(output_fps)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return ''
+    return '-skip_frame noref' if ratio >= SKIP_FRAME_RATIO else ''
+
+
+def overlaps(a, b):
+    """True if two tiles share any pixels"""
+    return a['x'] < b['x'] + b['w'] and b['x'] < a['x'] + a['w'] and \
+        a['y'] < b['y'] + b['h'] and b['y'] < a['y'] + a['h']
+
+
+def can_tile(tiles, width, height):
+    """True if every tile lies inside the canvas and no two tiles overlap"""
+    for i, tile in enumerate(tiles):
+        if tile['x'] < 0 or tile['y'] < 0 or tile['x'] + tile['w'] > width or tile['y'] + tile['h'] > height:
+            return False
+        if any(overlaps(tile, other) for other in tiles[i + 1:]):
+            return False
+    return True
+
+
+def covers_canvas(tiles, width, height):
+    """For non-overlapping tiles inside the canvas: True if they leave no gaps"""
+    return sum(tile['w'] * tile['h'] for tile in tiles) == width * height
+
+
+def choose_mode(tiles, width, height, ffmpeg_version=None, mode='auto'):
+    """'xstack' or 'overlay' for these tiles (mode 'overlay' forces the overlay chain)"""
+    if mode == 'overlay' or not tiles or not can_tile(tiles, width, height):
+        return 'overlay'
+    fill_supported = ffmpeg_version is not None and ffmpeg_version >= XSTACK_FILL_VERSION
+    if len(tiles) > 1 and not fill_supported and not covers_canvas(tiles, width, height):
+        # Without fill, xstack leaves uncovered pixels uninitialized
+        return 'overlay'
+    return 'xstack'
+
+
+def build_filter_complex(tiles, width, height, fps, mode, sources=None, output='outv', prefix='', control=None):
+    """
+    Filter graph composing one source per tile into [output].
+
+    tiles: [{'x', 'y', 'w', 'h'}], already sorted so always-on-top tiles come last.
+    sources: pad label feeding each tile, inputs 0..N-1 ('[0:v]', ...) by default.
+    prefix: prepended to intermediate labels so several graphs can be joined.
+    control: filters (see control_filters) run on the canvas of an overlay graph.
+    """
+    if sources is None:
+        sources = [f'[{i}:v]' for i in range(len(tiles))]
+    if mode == 'xstack':
+        return _xstack_graph(tiles, width, height, fps, sources, output, prefix)
+    return _overlay_graph(tiles, width, height, fps, sources, output, prefix, control)
+
+
+def build_shared_filter_complex(layouts, control=None):
+    """
+    One filter graph for several layouts sharing inputs.
+
+    layouts: [{'tiles', 'width', 'height', 'fps', 'mode', 'inputs', 'output'}] where
+    'inputs' holds the FFmpeg input index of each tile. An input used by more than one
+    tile is split instead of being opened (and decoded) again. control is placed in
+    the first overlay layout; commands reach filters anywhere in the graph.
+    """
+    uses = {}
+    for layout in layouts:
+        for index in layout['inputs']:
+            uses[index] = uses.get(index, 0) + 1
+
+    filters = []
+    branches = {}
+    for index, count in uses.items():
+        if count == 1:
+            branches[index] = [f'[{index}:v]']
+        else:
+            branches[index] = [f'[s{index}_{n}]' for n in range(count)]
+            filters.append(f'[{index}:v]split={count}' + ''.join(branches[index]))
+
+    for n, layout in enumerate(layouts):
+        sources = [branches[index].pop(0) for index in layout['inputs']]
+        layout_control = None
+        if control and layout['mode'] == 'overlay':
+            layout_control, control = control, None
+        filters.append(build_filter_complex(layout['tiles'], layout['width'], layout['height'], layout['fps'],
+                                            layout['mode'], sources=sources, output=layout['output'],
+                                            prefix=shared_prefix(n), control=layout_control))
+    return ";".join(filters)
+
+
+def shared_prefix(index):
+    """Label/filter name prefix of the index-th layout in a shared graph"""
+    return f'l{index}_'
+
+
+def tile_commands(tiles, prefix=''):
+    """Filter commands moving and resizing the tiles of a running overlay graph"""
+    commands = []
+    for i, tile in enumerate(tiles):
+        commands += [f'scale@{prefix}s{i} w {tile["w"]}', f'scale@{prefix}s{i} h {tile["h"]}',
+                     f'overlay@{prefix}o{i} x {tile["x"]}', f'overlay@{prefix}o{i} y {tile["y"]}']
+    return commands
+
+
+def sendcmd_script(commands):
+    """sendcmd file sending commands once, on the first frame"""
+    return f'0.0 {", ".join(commands)};\n' if commands else ''
+
+
+def control_filters(address=None, script=None):
+    """
+    Filters giving a graph a command channel: a zmq socket bound to address
+    ('tcp://127.0.0.1:5590') and/or a sendcmd script file run at startup.
+    """
+    filters = []
+    if address:
+        filters.append(f"zmq=bind_address='{_escape_option(address)}'")
+    if script:
+        filters.append(f"sendcmd=filename='{_escape_option(script)}'")
+    return filters
+
+
+def _escape_option(value):
+    # Quoted at the graph level, so only the option level ':' needs escaping.
+    # FFmpeg accepts forward slashes in Windows paths.
+    return value.replace('\\', '/').replace(':', '\\:')
+
+
+def _overlay_graph(tiles, width, height, fps, sources, output, prefix, control=None):
+    # Normalize timestamps to prevent sync-induced jumping, and drop frames down to
+    # the output rate before scaling so frames the overlay would discard are never scaled
+    filters = [f'{src}setpts=PTS-STARTPTS,fps={fps},scale@{prefix}s{i}={t["w"]}:{t["h"]}[{prefix}v{i}]'
+               for i, (t, src) in enumerate(zip(tiles, sources))]
+    # Force a constant baseline framerate. Commands are handled as canvas frames pass,
+    # which keep flowing when every input has stalled.
+    base = ','.join([f'color=black:s={width}x{height}:r={fps}'] + list(control or []))
+    chain = [f'{base}[{prefix}base]']
+    last_label = f'[{prefix}base]'
+    for i, tile in enumerate(tiles):
+        next_label = f'[{prefix}tmp{i}]' if i < len(tiles) - 1 else f'[{output}]'
+        # repeatlast=1 is critical: if one input stops, the others keep flowing
+        chain.append(f'{last_label}[{prefix}v{i}]overlay@{prefix}o{i}={tile["x"]}:{tile["y"]}:eof_action=pass:repeatlast=1{next_label}')
+        last_label = next_label
+    return ";".join(filters) + ";" + ";".join(chain)
+
+
+def _xstack_graph(tiles, width, height, fps, sources, output, prefix):
+    # Every input is resampled to the output rate on the same timestamp grid (before
+    # scaling, so dropped frames are never scaled), so xstack emits one frame per output
+    # tick; the overlay chain gets this from its color base. xstack also needs a common
+    # pixel format.
+    filters = [f'{src}setpts=PTS-STARTPTS,fps={fps},scale={t["w"]}:{t["h"]},format=yuv420p[{prefix}v{i}]'
+               for i, (t, src) in enumerate(zip(tiles, sources))]
+
+    if len(tiles) == 1:
+        tile = tiles[0]
+        filters.append(f'[{prefix}v0]pad={width}:{height}:{tile["x"]}:{tile["y"]}:black[{output}]')
+        return ";".join(filters)
+
+    labels = ''.join(f'[{prefix}v{i}]' for i in range(len(tiles)))
+    layout = '|'.join(f'{t["x"]}_{t["y"]}' for t in tiles)
+    stack = f'{labels}xstack=inputs={len(tiles)}:layout={layout}'
+    if not covers_canvas(tiles, width, height):
+        stack += ':fill=black'
+
+    # xstack sizes its output to the tiles' extent; pad up to the canvas if needed
+    extent_w = max(t['x'] + t['w'] for t in tiles)
+    extent_h = max(t['y'] + t['h'] for t in tiles)
+    if (extent_w, extent_h) != (width, height):
+        stack += f',pad={width}:{height}:0:0:black'
+    filters.append(stack + f'[{output}]')
+    return ";".join(filters)
@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ConfigStore:
+    """
+    In-memory copy of camera_config.json.
+
+    Reads are served from the parsed dict; the file is only re-parsed when its
+    mtime/size changed (checked at most once per STAT_INTERVAL), which picks up
+    external edits. `version` increases on every load or write.
+
+    Writes update the cached copy immediately and are persisted write-behind:
+    a burst of writes within WRITE_DELAY is coalesced into a single atomic,
+    fsynced file replace (at most MAX_WRITE_DELAY after the first change).
+    flush() persists pending changes synchronously (shutdown, backup, restore).
+
+    The dict returned by get() is shared, callers must not modify it.
+    """
+
+    STAT_INTERVAL = 1.0     # Seconds between mtime checks
+    WRITE_DELAY = 0.5       # Quiet time before a pending write is persisted
+    MAX_WRITE_DELAY = 2.0   # Upper bound on how long a change stays unpersisted
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self.writes = 0            # Files actually written (vs. write() calls)
+        self._config = None
+        self._signature = False    # (mtime_ns, size) of the file the cache came from, None if missing
+        self._last_check = 0
+        self._lock = threading.RLock()
+        self._io_lock = threading.Lock()
+        self._dirty_since = None   # Time of the first unpersisted write
+        self._last_write = 0
+        self._wakeup = threading.Condition(self._lock)
+        self._writer = None
+
+    def exists(self):
+        return self.get(default=None) is not None
+
+    def get(self, default=None):
+        """Return the parsed config (or default if there is no config file)"""
+        with self._lock:
+            now = time.time()
+            # While a write is pending the cache is newer than the file
+            if self._dirty_since is None and (self._config is None or now - self._last_check >= self.STAT_INTERVAL):
+                self._last_check = now
+                signature = self._stat()
+                if signature != self._signature:
+                    self._load(signature)
+            return self._config if self._config is not None else default
+
+    def write(self, config):
+        """Make config the current copy and schedule it to be persisted"""
+        # Cache a parsed copy, not the caller's live objects
+        snapshot = json.loads(json.dumps(config))
+        with self._lock:
+            self._config = snapshot
+            self.version += 1
+            now = time.time()
+            self._last_write = now
+            if self._dirty_since is None:
+                self._dirty_since = now
+            if not self._writer or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run_writer, daemon=True, name='config-writer')
+                self._writer.start()
+            self._wakeup.notify()
+
+    def flush(self):
+        """Persist any pending write now"""
+        with self._io_lock:
+            with self._lock:
+                if self._dirty_since is None:
+                    return
+                config = self._config
+                version = self.version
+            self._persist(config, version)
+
+    def invalidate(self):
+        """Drop pending writes and force the next get() to re-read the file (after writing it directly)"""
+        with self._io_lock:
+            with self._lock:
+                self._dirty_since = None
+                self._signature = False
+                self._config = None
+
+    def _run_writer(self):
+        """Debounce loop: persist once writes have been quiet for WRITE_DELAY"""
+        while True:
+            with self._lock:
+                while self._dirty_since is None:
+                    if not self._wakeup.wait(timeout=60):
+                        # Idle for a minute, exit (write() starts a new writer)
+                        if self._dirty_since is None:
+                            self._writer = None
+                            return
+                now = time.time()
+                due = min(self._last_write + self.WRITE_DELAY, self._dirty_since + self.MAX_WRITE_DELAY)
+                if now < due:
+                    self._wakeup.wait(timeout=due - now)
+                    continue
+            self.flush()
+
+    def _persist(self, config, version):
+        """Write config atomically with fsync (called with the I/O lock held)"""
+        text = json.dumps(config, indent=2)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        temp_path = None
+        try:
+            # Use a temporary file for atomic write
+            fd, temp_path = tempfile.mkstemp(dir=directory, text=True)
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+
+            # Atomic rename, then fsync the directory so the rename itself is durable
+            os.replace(temp_path, self.path)
+            temp_path = None
+            if hasattr(os, 'O_DIRECTORY'):
+                dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+        except Exception as e:
+            print(f"Error saving config: {e}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            with self._lock:
+                # Retry on a later debounce cycle
+                self._last_write = self._dirty_since = time.time()
+            return
+
+        with self._lock:
+            self.writes += 1
+            self._signature = self._stat()
+            self._last_check = time.time()
+            if self.version == version:
+                self._dirty_since = None
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _load(self, signature):
+        """Re-parse the file (called with the lock held)"""
+        if signature is None:
+            self._config = None
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    self._config = json.load(f)
+            except (OSError, ValueError) as e:
+                # Keep serving the last good copy if an external edit left the file broken
+                print(f"Error loading config: {e}")
+                if self._config is None:
+                    raise
+                return
+        self._signature = signature
+        self.version += 1
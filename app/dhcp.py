@@ -0,0 +1,545 @@
+import ctypes
+import random
+import select
+import socket
+import struct
+import subprocess
+import threading
+import time
+from . import netlink
+
+# In-process DHCP client for the virtual NICs.
+#
+# Each lease uses an AF_PACKET socket bound to its macvlan (with a BPF filter so only
+# UDP replies to port 68 reach Python). One thread runs every lease's state machine:
+# DISCOVER/OFFER/REQUEST/ACK, then RENEWING (unicast) at T1, REBINDING (broadcast)
+# at T2 and a fresh DISCOVER if the lease expires. Addresses are configured over
+# rtnetlink; no routes or DNS are applied, same as the isolated dhclient config.
+
+ETH_P_IP = 0x0800
+SO_ATTACH_FILTER = 26
+
+SERVER_PORT = 67
+CLIENT_PORT = 68
+MAGIC_COOKIE = b'\x63\x82\x53\x63'
+BROADCAST_MAC = b'\xff' * 6
+
+DHCPDISCOVER = 1
+DHCPOFFER = 2
+DHCPREQUEST = 3
+DHCPACK = 5
+DHCPNAK = 6
+DHCPRELEASE = 7
+
+OPT_SUBNET_MASK = 1
+OPT_HOSTNAME = 12
+OPT_REQUESTED_IP = 50
+OPT_LEASE_TIME = 51
+OPT_MESSAGE_TYPE = 53
+OPT_SERVER_ID = 54
+OPT_PARAMETERS = 55
+OPT_RENEWAL_TIME = 58
+OPT_REBINDING_TIME = 59
+OPT_CLIENT_ID = 61
+OPT_END = 255
+
+_BOOTP = struct.Struct('!BBBBIHH4s4s4s4s16s64s128s')
+_IP = struct.Struct('!BBHHHBBH4s4s')
+_UDP = struct.Struct('!HHHH')
+
+# tcpdump -dd "udp dst port 68" (IPv4, unfragmented)
+_BPF_UDP_68 = [
+    (0x28, 0, 0, 12), (0x15, 0, 8, 0x0800),
+    (0x30, 0, 0, 23), (0x15, 0, 6, 17),
+    (0x28, 0, 0, 20), (0x45, 4, 0, 0x1fff),
+    (0xb1, 0, 0, 14), (0x48, 0, 0, 16), (0x15, 0, 1, CLIENT_PORT),
+    (0x06, 0, 0, 0x40000), (0x06, 0, 0, 0),
+]
+
+
+def is_available():
+    """True if raw packet sockets exist on this platform (Linux)"""
+    return hasattr(socket, 'AF_PACKET')
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def build_packet(message_type, xid, mac, ciaddr='0.0.0.0', requested_ip=None, server_id=None,
+                 hostname=None, broadcast=True):
+    """Build a BOOTREQUEST carrying a DHCP message"""
+    chaddr = mac + b'\0' * (16 - len(mac))
+    packet = _BOOTP.pack(1, 1, 6, 0, xid, 0, 0x8000 if broadcast else 0,
+                         socket.inet_aton(ciaddr), b'\0' * 4, b'\0' * 4, b'\0' * 4,
+                         chaddr, b'', b'')
+    options = [(OPT_MESSAGE_TYPE, bytes([message_type])), (OPT_CLIENT_ID, b'\x01' + mac)]
+    if requested_ip:
+        options.append((OPT_REQUESTED_IP, socket.inet_aton(requested_ip)))
+    if server_id:
+        options.append((OPT_SERVER_ID, socket.inet_aton(server_id)))
+    if hostname:
+        options.append((OPT_HOSTNAME, hostname.encode()[:63]))
+    if message_type in (DHCPDISCOVER, DHCPREQUEST):
+        # Address and lease timers only: no router or DNS for the host to pick up
+        options.append((OPT_PARAMETERS, bytes([OPT_SUBNET_MASK, OPT_LEASE_TIME, OPT_RENEWAL_TIME,
+                                               OPT_REBINDING_TIME, OPT_SERVER_ID])))
+    packet += MAGIC_COOKIE
+    for code, value in options:
+        packet += bytes([code, len(value)]) + value
+    packet += bytes([OPT_END])
+    # Some servers ignore requests shorter than a minimal BOOTP packet
+    return packet + b'\0' * max(0, 300 - len(packet))
+
+
+def parse_packet(data):
+    """Parse a BOOTREPLY into a dict (None if it is not a well-formed DHCP reply)"""
+    if len(data) < _BOOTP.size + 4 or data[_BOOTP.size:_BOOTP.size + 4] != MAGIC_COOKIE:
+        return None
+    fields = _BOOTP.unpack_from(data)
+    if fields[0] != 2:
+        return None
+    options = {}
+    offset = _BOOTP.size + 4
+    while offset < len(data):
+        code = data[offset]
+        if code == OPT_END:
+            break
+        if code == 0:
+            offset += 1
+            continue
+        if offset + 1 >= len(data):
+            break
+        length = data[offset + 1]
+        if offset + 2 + length > len(data):
+            return None
+        options[code] = data[offset + 2:offset + 2 + length]
+        offset += 2 + length
+    if len(options.get(OPT_MESSAGE_TYPE, b'')) != 1:
+        return None
+    return {
+        'xid': fields[4],
+        'yiaddr': socket.inet_ntoa(fields[8]),
+        'chaddr': fields[11][:fields[2]],
+        'type': options[OPT_MESSAGE_TYPE][0],
+        'options': options,
+    }
+
+
+def build_frame(src_mac, dst_mac, src_ip, dst_ip, payload):
+    """Ethernet + IPv4 + UDP (client port -> server port) around a DHCP payload"""
+    udp = _UDP.pack(CLIENT_PORT, SERVER_PORT, _UDP.size + len(payload), 0) + payload
+    header = _IP.pack(0x45, 0, _IP.size + len(udp), random.randint(0, 0xffff), 0, 64, socket.IPPROTO_UDP, 0,
+                      socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+    header = header[:10] + struct.pack('!H', _checksum(header)) + header[12:]
+    return dst_mac + src_mac + struct.pack('!H', ETH_P_IP) + header + udp
+
+
+def parse_frame(frame):
+    """Return (source MAC, UDP payload) of an IPv4/UDP frame to the client port, else None"""
+    if len(frame) < 14 + _IP.size + _UDP.size or struct.unpack_from('!H', frame, 12)[0] != ETH_P_IP:
+        return None
+    ihl = (frame[14] & 0x0f) * 4
+    if frame[23] != socket.IPPROTO_UDP or ihl < _IP.size:
+        return None
+    udp_offset = 14 + ihl
+    if len(frame) < udp_offset + _UDP.size:
+        return None
+    _, dst_port, length, _ = _UDP.unpack_from(frame, udp_offset)
+    if dst_port != CLIENT_PORT or length < _UDP.size or udp_offset + length > len(frame):
+        return None
+    return frame[6:12], frame[udp_offset + _UDP.size:udp_offset + length]
+
+
+def _prefix_from_mask(mask_bytes):
+    return bin(struct.unpack('!I', mask_bytes)[0]).count('1') if len(mask_bytes) == 4 else 32
+
+
+class Lease:
+    """State of one interface's DHCP lease"""
+
+    def __init__(self, interface, mac, sock, hostname=None):
+        self.interface = interface
+        self.mac = mac
+        self.sock = sock
+        self.udp = None             # Bound to the leased IP while it is configured
+        self.hostname = hostname
+        self.state = 'init'
+        self.xid = 0
+        self.ip = None
+        self.prefix = 32
+        self.configured = None      # (ip, prefix) currently assigned to the interface
+        self.offered_ip = None
+        self.server_id = None
+        self.server_mac = BROADCAST_MAC
+        self.lease_time = 0
+        self.bound_at = 0
+        self.renew_at = 0
+        self.rebind_at = 0
+        self.expires_at = 0
+        self.next_action = 0
+        self.retry = 0
+        self.attempts = 0
+        self.bound = threading.Event()
+
+    def to_dict(self):
+        return {
+            'interface': self.interface,
+            'mac': ':'.join(f'{b:02x}' for b in self.mac),
+            'state': self.state,
+            'ip': self.ip,
+            'prefix': self.prefix,
+            'server': self.server_id,
+            'leaseTime': self.lease_time,
+            'boundAt': self.bound_at or None,
+            'renewAt': self.renew_at or None,
+            'expiresAt': self.expires_at or None,
+        }
+
+
+class DHCPClient:
+    """
+    Runs DHCP leases for many interfaces from a single thread.
+
+    acquire() blocks the calling camera until its lease is bound (or times out),
+    while renewals and rebinding are handled here for as long as the lease is held.
+    """
+
+    RETRY_INITIAL = 1           # First retransmit delay, doubled up to RETRY_MAX
+    RETRY_MAX = 16
+    REQUEST_ATTEMPTS = 4        # REQUESTs before falling back to DISCOVER
+    DEFAULT_LEASE_TIME = 3600   # If the server does not send one
+    MIN_RENEW_RETRY = 10        # Floor for retransmits while renewing/rebinding
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases = {}       # interface -> Lease
+        self._thread = None
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._netlink = netlink.Netlink() if netlink.is_available() else None
+
+    # --- Public API ---
+
+    def acquire(self, interface, mac=None, timeout=10, hostname=None):
+        """
+        Start a lease on the interface and wait for it to be bound. Returns the IP,
+        or None on timeout (the lease is then dropped). Raises PermissionError
+        without CAP_NET_RAW.
+        """
+        mac = mac or self._read_mac(interface)
+        if isinstance(mac, str):
+            mac = bytes(int(part, 16) for part in mac.replace('-', ':').split(':'))
+        sock = self._open_socket(interface)
+        lease = Lease(interface, mac, sock, hostname)
+        with self._lock:
+            previous = self._leases.pop(interface, None)
+            self._leases[interface] = lease
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name='dhcp-client')
+                self._thread.start()
+        if previous:
+            previous.sock.close()
+        self._wake()
+
+        if lease.bound.wait(timeout):
+            return lease.ip
+        self.release(interface, send=False)
+        return None
+
+    def release(self, interface, send=True):
+        """Stop the lease (sending DHCPRELEASE if bound) and remove its address"""
+        with self._lock:
+            lease = self._leases.pop(interface, None)
+        if not lease:
+            return False
+        if send and lease.ip and lease.server_id:
+            try:
+                self._send(lease, DHCPRELEASE, ciaddr=lease.ip, server_id=lease.server_id, unicast=True)
+            except OSError:
+                pass
+        self._unconfigure(lease)
+        lease.state = 'released'
+        lease.sock.close()
+        self._close_udp(lease)
+        self._wake()
+        return True
+
+    def has_lease(self, interface):
+        with self._lock:
+            return interface in self._leases
+
+    def get_lease(self, interface):
+        with self._lock:
+            lease = self._leases.get(interface)
+        return lease.to_dict() if lease else None
+
+    def get_leases(self):
+        with self._lock:
+            leases = list(self._leases.values())
+        return [lease.to_dict() for lease in leases]
+
+    # --- Event loop ---
+
+    def _run(self):
+        while True:
+            with self._lock:
+                leases = list(self._leases.values())
+                if not leases:
+                    self._thread = None
+                    return
+            now = time.time()
+            timeout = max(0, min(min(lease.next_action for lease in leases) - now, 60))
+            by_socket = {}
+            for lease in leases:
+                for sock in (lease.sock, lease.udp):
+                    if sock and sock.fileno() >= 0:
+                        by_socket[sock] = lease
+            try:
+                readable, _, _ = select.select([self._wake_r] + list(by_socket), [], [], timeout)
+            except (OSError, ValueError):
+                # A socket was closed by release() while we were waiting
+                continue
+
+            for sock in readable:
+                if sock is self._wake_r:
+                    try:
+                        while self._wake_r.recv(64):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                lease = by_socket[sock]
+                try:
+                    data = sock.recv(4096)
+                except OSError:
+                    continue
+                # Anyone on the LAN can send to port 68: a bad packet must not stop every lease
+                try:
+                    if sock is lease.udp:
+                        self._handle_reply(lease, None, data)
+                    else:
+                        parsed = parse_frame(data)
+                        if parsed:
+                            self._handle_reply(lease, *parsed)
+                except Exception as e:
+                    print(f"  DHCP {lease.interface}: ignoring reply ({e})")
+
+            now = time.time()
+            for lease in leases:
+                if lease.next_action <= now and self._is_active(lease):
+                    try:
+                        self._on_timer(lease, now)
+                    except Exception as e:
+                        # Interface went away or is down, try again later
+                        lease.next_action = now + self.RETRY_MAX
+                        print(f"  DHCP {lease.interface}: {e}")
+
+    def _is_active(self, lease):
+        with self._lock:
+            return self._leases.get(lease.interface) is lease
+
+    def _on_timer(self, lease, now):
+        if lease.state in ('init', 'selecting') or (lease.state == 'requesting' and lease.attempts >= self.REQUEST_ATTEMPTS):
+            if lease.state != 'selecting':
+                lease.xid = random.getrandbits(32)
+                lease.retry = self.RETRY_INITIAL
+                lease.state = 'selecting'
+            self._send(lease, DHCPDISCOVER)
+            self._schedule_retry(lease, now)
+        elif lease.state == 'requesting':
+            lease.attempts += 1
+            self._send(lease, DHCPREQUEST, requested_ip=lease.offered_ip, server_id=lease.server_id)
+            self._schedule_retry(lease, now)
+        elif lease.state in ('bound', 'renewing', 'rebinding'):
+            if now >= lease.expires_at:
+                print(f"  DHCP {lease.interface}: lease on {lease.ip} expired")
+                self._unconfigure(lease)
+                lease.ip = None
+                lease.state = 'init'
+                lease.next_action = now
+                return
+            if now >= lease.rebind_at:
+                lease.state = 'rebinding'
+                # Broadcast with ciaddr unset (INIT-REBOOT form) so the ACK is broadcast too
+                # and reaches the macvlan even if unicast to the leased IP does not
+                self._send(lease, DHCPREQUEST, requested_ip=lease.ip)
+                deadline = lease.expires_at
+            else:
+                lease.state = 'renewing'
+                self._send(lease, DHCPREQUEST, ciaddr=lease.ip, unicast=True)
+                deadline = lease.rebind_at
+            # RFC 2131: retry at half the remaining time, not too often
+            lease.next_action = now + max((deadline - now) / 2, self.MIN_RENEW_RETRY)
+            lease.next_action = min(lease.next_action, deadline)
+
+    def _schedule_retry(self, lease, now):
+        lease.next_action = now + lease.retry + random.uniform(-0.1, 0.1) * lease.retry
+        lease.retry = min(lease.retry * 2, self.RETRY_MAX)
+
+    def _handle_reply(self, lease, src_mac, payload):
+        """Advance the lease on an OFFER/ACK/NAK (src_mac is None for replies read from the UDP socket)"""
+        reply = parse_packet(payload)
+        if not reply or reply['xid'] != lease.xid or reply['chaddr'] != lease.mac:
+            return
+        options = reply['options']
+        server_id = options.get(OPT_SERVER_ID)
+        server_id = socket.inet_ntoa(server_id) if server_id and len(server_id) == 4 else None
+        now = time.time()
+
+        if reply['type'] == DHCPOFFER and lease.state == 'selecting':
+            lease.offered_ip = reply['yiaddr']
+            lease.server_id = server_id
+            lease.server_mac = src_mac or lease.server_mac
+            lease.state = 'requesting'
+            lease.attempts = 1
+            lease.retry = self.RETRY_INITIAL
+            self._send(lease, DHCPREQUEST, requested_ip=lease.offered_ip, server_id=lease.server_id)
+            self._schedule_retry(lease, now)
+
+        elif reply['type'] == DHCPACK and lease.state in ('requesting', 'renewing', 'rebinding'):
+            lease_time = self._option_int(options, OPT_LEASE_TIME, self.DEFAULT_LEASE_TIME)
+            lease.lease_time = lease_time
+            lease.bound_at = now
+            lease.renew_at = now + self._option_int(options, OPT_RENEWAL_TIME, lease_time * 0.5)
+            lease.rebind_at = now + self._option_int(options, OPT_REBINDING_TIME, lease_time * 0.875)
+            lease.expires_at = now + lease_time
+            lease.next_action = lease.renew_at
+            lease.server_id = server_id or lease.server_id
+            lease.server_mac = src_mac or lease.server_mac
+            lease.ip = reply['yiaddr']
+            lease.prefix = _prefix_from_mask(options.get(OPT_SUBNET_MASK, b''))
+            was_bound = lease.bound.is_set()
+            lease.state = 'bound'
+            self._configure(lease)
+            if not was_bound:
+                print(f"  DHCP {lease.interface}: bound {lease.ip}/{lease.prefix} from {lease.server_id} ({lease_time}s)")
+            lease.bound.set()
+
+        elif reply['type'] == DHCPNAK and lease.state in ('requesting', 'renewing', 'rebinding'):
+            print(f"  DHCP {lease.interface}: server {server_id} refused the lease, restarting")
+            self._unconfigure(lease)
+            lease.ip = None
+            lease.state = 'init'
+            lease.next_action = now + self.RETRY_INITIAL
+
+    @staticmethod
+    def _option_int(options, code, default):
+        value = options.get(code)
+        return struct.unpack('!I', value)[0] if value and len(value) == 4 else int(default)
+
+    # --- I/O helpers ---
+
+    def _send(self, lease, message_type, ciaddr='0.0.0.0', requested_ip=None, server_id=None, unicast=False):
+        payload = build_packet(message_type, lease.xid, lease.mac, ciaddr=ciaddr, requested_ip=requested_ip,
+                               server_id=server_id, hostname=lease.hostname, broadcast=ciaddr == '0.0.0.0')
+        if unicast and lease.server_id:
+            frame = build_frame(lease.mac, lease.server_mac, ciaddr, lease.server_id, payload)
+        else:
+            frame = build_frame(lease.mac, BROADCAST_MAC, ciaddr, '255.255.255.255', payload)
+        lease.sock.send(frame)
+
+    def _open_socket(self, interface):
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_IP))
+        try:
+            sock.bind((interface, ETH_P_IP))
+            self._attach_filter(sock)
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    @staticmethod
+    def _attach_filter(sock):
+        """Let the kernel drop everything but DHCP replies (frames are still checked in Python)"""
+        program = b''.join(struct.pack('HBBI', *instruction) for instruction in _BPF_UDP_68)
+        buffer = ctypes.create_string_buffer(program)
+        fprog = struct.pack('HL', len(_BPF_UDP_68), ctypes.addressof(buffer))
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _read_mac(interface):
+        with open(f'/sys/class/net/{interface}/address') as f:
+            return f.read().strip()
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+
+    def _configure(self, lease):
+        """Put the leased address on the interface (replacing a different previous one)"""
+        wanted = (lease.ip, lease.prefix)
+        if lease.configured == wanted:
+            return
+        self._unconfigure(lease)
+        try:
+            if self._netlink:
+                self._netlink.add_ipv4(lease.interface, lease.ip, lease.prefix)
+            else:
+                subprocess.run(['sudo', 'ip', 'addr', 'add', f'{lease.ip}/{lease.prefix}', 'dev', lease.interface],
+                               check=True, capture_output=True)
+        except PermissionError:
+            if self._netlink:
+                # No CAP_NET_ADMIN, use 'sudo ip' from now on
+                self._netlink = None
+                return self._configure(lease)
+            print(f"  DHCP {lease.interface}: not permitted to assign {lease.ip}")
+            return
+        except netlink.NetlinkError as e:
+            if e.errno != 17:   # EEXIST: already there
+                print(f"  DHCP {lease.interface}: could not assign {lease.ip}: {e}")
+                return
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"  DHCP {lease.interface}: could not assign {lease.ip}: {e}")
+            return
+        lease.configured = wanted
+        self._open_udp(lease)
+
+    def _open_udp(self, lease):
+        """
+        Renewal replies are unicast to the leased IP. The host may answer ARP for it
+        on the parent NIC, so the ACK does not always arrive on the macvlan; a UDP
+        socket on the address receives it whichever interface it came in on.
+        """
+        self._close_udp(lease)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((lease.ip, CLIENT_PORT))
+            sock.setblocking(False)
+        except OSError:
+            sock.close()
+            return
+        lease.udp = sock
+
+    @staticmethod
+    def _close_udp(lease):
+        if lease.udp:
+            lease.udp.close()
+            lease.udp = None
+
+    def _unconfigure(self, lease):
+        if not lease.configured:
+            return
+        ip, prefix = lease.configured
+        lease.configured = None
+        self._close_udp(lease)
+        try:
+            if self._netlink:
+                self._netlink.delete_ipv4(lease.interface, ip, prefix)
+            else:
+                subprocess.run(['sudo', 'ip', 'addr', 'del', f'{ip}/{prefix}', 'dev', lease.interface],
+                               check=False, capture_output=True)
+        except OSError:
+            pass
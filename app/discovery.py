@@ -0,0 +1,169 @@
+import re
+import socket
+import struct
+import threading
+import time
+from xml.sax.saxutils import escape
+
+MCAST_GRP = '239.255.255.250'
+MCAST_PORT = 3702
+
+# Matches <MessageID>, <a:MessageID>, <wsa:MessageID ...> etc.
+_MESSAGE_ID_RE = re.compile(r'<(?:[\w-]+:)?MessageID[^>]*>\s*(.*?)\s*</(?:[\w-]+:)?MessageID>', re.S)
+
+
+class WSDiscoveryResponder:
+    """
+    Single WS-Discovery responder shared by all virtual cameras.
+
+    One socket joins the multicast group, each Probe is received and parsed once,
+    and a ProbeMatches reply is sent for every running camera. The per-camera
+    reply XML is pre-rendered when the camera registers, so answering a Probe
+    only splices in the message IDs.
+    """
+
+    def __init__(self):
+        self.sock = None
+        self.thread = None
+        self.running = False
+        self._cameras = {}  # camera_id -> (camera, head, middle, tail)
+        self._joined_ips = set()
+        self._lock = threading.Lock()
+        # Cameras register from parallel startup workers: one socket, joined once per IP
+        self._start_lock = threading.Lock()
+
+    def register(self, camera, local_ip):
+        """Add (or refresh) a camera's pre-rendered ProbeMatch"""
+        self.start()
+
+        head, middle, tail = self._render_probe_match(camera, local_ip)
+        with self._lock:
+            self._cameras[camera.id] = (camera, head, middle, tail)
+
+        # vNIC cameras also listen for multicast on their own interface
+        with self._start_lock:
+            if self.sock and local_ip and local_ip not in self._joined_ips:
+                self._join_group(local_ip)
+
+        print(f"  WS-Discovery registered {camera.name} on {local_ip}:{camera.onvif_port}")
+
+    def unregister(self, camera_id):
+        """Stop answering Probes for a camera"""
+        with self._lock:
+            self._cameras.pop(camera_id, None)
+
+    def start(self):
+        """Bind the discovery socket and start the responder thread (no-op if running)"""
+        with self._start_lock:
+            if self.running:
+                return
+
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(('', MCAST_PORT))
+                mreq = struct.pack('4sl', socket.inet_aton(MCAST_GRP), socket.INADDR_ANY)
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+            except Exception as e:
+                print(f"  Discovery service error: {e}")
+                print("  Cameras can still be added manually in ODM")
+                sock.close()
+                return
+
+            self.sock = sock
+            self.running = True
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            print("  WS-Discovery responder started")
+
+    def stop(self):
+        """Stop the responder thread"""
+        with self._start_lock:
+            self.running = False
+            if self.sock:
+                try:
+                    self.sock.close()
+                except:
+                    pass
+                self.sock = None
+            self._joined_ips.clear()
+
+    def _join_group(self, local_ip):
+        """Join the discovery multicast group on a specific interface address"""
+        try:
+            mreq = struct.pack('4s4s', socket.inet_aton(MCAST_GRP), socket.inet_aton(local_ip))
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        except OSError:
+            # Already joined via the default interface or address not local
+            pass
+        self._joined_ips.add(local_ip)
+
+    def _render_probe_match(self, camera, local_ip):
+        """Pre-render a camera's ProbeMatches reply split around the per-request IDs"""
+        head = f'''<?xml version="1.0" encoding="UTF-8"?>
+<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
+                   xmlns:SOAP-ENC="http://www.w3.org/2003/05/soap-encoding"
+                   xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"
+                   xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"
+                   xmlns:dn="http://www.onvif.org/ver10/network/wsdl">
+    <SOAP-ENV:Header>
+        <wsa:MessageID>uuid:{camera.id}-'''
+        middle = '''</wsa:MessageID>
+        <wsa:RelatesTo>'''
+        tail = f'''</wsa:RelatesTo>
+        <wsa:To SOAP-ENV:mustUnderstand="true">http://schemas.xmlsoap.org/ws/2004/08/addressing/role/anonymous</wsa:To>
+        <wsa:Action SOAP-ENV:mustUnderstand="true">http://schemas.xmlsoap.org/ws/2005/04/discovery/ProbeMatches</wsa:Action>
+    </SOAP-ENV:Header>
+    <SOAP-ENV:Body>
+        <d:ProbeMatches>
+            <d:ProbeMatch>
+                <wsa:EndpointReference>
+                    <wsa:Address>urn:uuid:{camera.uuid}</wsa:Address>
+                </wsa:EndpointReference>
+                <d:Types>dn:NetworkVideoTransmitter</d:Types>
+                <d:Scopes>onvif://www.onvif.org/type/NetworkVideoTransmitter onvif://www.onvif.org/name/{escape(camera.name.replace(' ', '_'))}</d:Scopes>
+                <d:XAddrs>http://{local_ip}:{camera.onvif_port}/</d:XAddrs>
+                <d:MetadataVersion>1</d:MetadataVersion>
+            </d:ProbeMatch>
+        </d:ProbeMatches>
+    </SOAP-ENV:Body>
+</SOAP-ENV:Envelope>'''
+        return head.encode('utf-8'), middle.encode('utf-8'), tail.encode('utf-8')
+
+    def _run(self):
+        """Receive Probes and answer for every running camera"""
+        sock = self.sock
+        while self.running:
+            try:
+                data, addr = sock.recvfrom(10240)
+            except OSError:
+                # Socket closed by stop()
+                break
+
+            try:
+                message = data.decode('utf-8', errors='ignore')
+
+                # Only answer Probes (not other devices' ProbeMatches)
+                if 'Probe' not in message and 'probe' not in message.lower():
+                    continue
+                if 'ProbeMatches' in message:
+                    continue
+
+                match = _MESSAGE_ID_RE.search(message)
+                msg_id = match.group(1) if match else "uuid:probe-request"
+                relates_to = escape(msg_id).encode('utf-8')
+                stamp = str(time.time()).encode('utf-8')
+
+                with self._lock:
+                    entries = list(self._cameras.values())
+
+                for camera, head, middle, tail in entries:
+                    if camera.status != "running":
+                        continue
+                    try:
+                        sock.sendto(b''.join((head, stamp, middle, relates_to, tail)), addr)
+                    except Exception as e:
+                        print(f"  Failed to send response: {e}")
+            except Exception as e:
+                if self.running:
+                    print(f"  Discovery error: {e}")
@@ -0,0 +1,159 @@
+import json
+import os
+import queue
+import threading
+import time
+import psutil
+
+
+class ProcessStatsSampler:
+    """CPU/memory of this process and all its children, using delta CPU timings"""
+
+    def __init__(self, min_interval=2):
+        self.min_interval = min_interval
+        self._last_time = time.time()
+        self._last_cpu = 0
+        self._latest = None
+        self._latest_time = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Latest stats, re-sampled at most once per min_interval however many callers ask"""
+        with self._lock:
+            now = time.time()
+            if self._latest is None or now - self._latest_time >= self.min_interval:
+                self._latest = self._sample(now)
+                self._latest_time = now
+            return self._latest
+
+    def _sample(self, current_time):
+        parent = psutil.Process(os.getpid())
+
+        # Memory (snapshot)
+        memory_info = parent.memory_info().rss
+        # CPU Times (cumulative)
+        cpu_times = parent.cpu_times()
+        total_cpu_time = cpu_times.user + cpu_times.system
+
+        # Sum up all children recursively
+        for child in parent.children(recursive=True):
+            try:
+                memory_info += child.memory_info().rss
+                child_times = child.cpu_times()
+                total_cpu_time += child_times.user + child_times.system
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+        # Calculate delta since last sample
+        delta_time = current_time - self._last_time
+        delta_cpu = total_cpu_time - self._last_cpu
+        self._last_time = current_time
+        self._last_cpu = total_cpu_time
+
+        # Normalization
+        cpu_count = psutil.cpu_count() or 1
+        if delta_time > 0:
+            # percentage = (seconds_of_cpu / seconds_of_wallclock) * 100
+            # Divided by cores to get 0-100% total system view
+            cpu_percent = (delta_cpu / delta_time) * 100 / cpu_count
+        else:
+            cpu_percent = 0.0
+
+        return {
+            'cpu_percent': min(100.0, round(max(0.0, cpu_percent), 1)),
+            'memory_mb': round(memory_info / (1024 * 1024), 1)
+        }
+
+
+class EventBroadcaster:
+    """
+    Server-Sent Events fan-out for the dashboards.
+
+    Stats, analytics and camera status are computed once per interval by a single
+    producer thread (only while someone is subscribed) and the encoded event is
+    queued to every subscriber. Log lines are pushed as they are written.
+    """
+
+    INTERVAL = 3            # Seconds between stats/analytics/camera checks
+    QUEUE_SIZE = 500        # Events buffered per subscriber before it is dropped as too slow
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.stats = ProcessStatsSampler()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_analytics_poll = None
+        self._last_camera_state = None
+
+    def subscribe(self):
+        """Register a client and return its event queue"""
+        q = queue.Queue(maxsize=self.QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.append(q)
+            if not self._thread or not self._thread.is_alive():
+                # Fresh producer: make sure the first tick pushes everything
+                self._last_analytics_poll = None
+                self._last_camera_state = None
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event, data):
+        """Encode an event once and queue it for every subscriber"""
+        if not self._subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        with self._lock:
+            for q in list(self._subscribers):
+                try:
+                    q.put_nowait(message)
+                except queue.Full:
+                    # Client stopped reading, drop it (the browser reconnects)
+                    self._subscribers.remove(q)
+                    try:
+                        q.put_nowait(None)
+                    except queue.Full:
+                        pass
+
+    def initial_events(self):
+        """Current state for a newly connected client"""
+        return [
+            self._encode('cameras', self._camera_list()),
+            self._encode('stats', self.stats.get()),
+            self._encode('analytics', self.manager.analytics.get_analytics()),
+        ]
+
+    def _encode(self, event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def _camera_list(self):
+        return [cam.to_dict() for cam in list(self.manager.cameras)]
+
+    def _run(self):
+        """Producer loop, exits once the last subscriber is gone"""
+        while self.has_subscribers():
+            try:
+                self.publish('stats', self.stats.get())
+
+                analytics_mgr = self.manager.analytics
+                if analytics_mgr.last_poll_time != self._last_analytics_poll:
+                    self._last_analytics_poll = analytics_mgr.last_poll_time
+                    self.publish('analytics', analytics_mgr.get_analytics())
+
+                cameras = self._camera_list()
+                state = json.dumps(cameras, sort_keys=True)
+                if state != self._last_camera_state:
+                    self._last_camera_state = state
+                    self.publish('cameras', cameras)
+            except Exception as e:
+                print(f"  Event stream error: {e}")
+            time.sleep(self.INTERVAL)
@@ -0,0 +1,510 @@
+import math
+import re
+import shlex
+import subprocess
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import psutil
+
+from . import compositor
+from .utils import MEDIAMTX_OUTPUT_THREAD
+
+# In-process GridFusion backend (advancedSettings.gridFusion.backend = 'python').
+#
+# Instead of one FFmpeg filter graph per layout, every source gets a small FFmpeg
+# decoder that outputs raw RGB frames already scaled to its tile size and rate. The
+# latest frame is kept in memory, and each layout blits changed tiles into a
+# persistent canvas that is piped to an FFmpeg encoder. A stalled source keeps
+# showing its last frame instead of stalling the whole composite, and layout edits
+# are applied to the running compositor without touching MediaMTX.
+
+# Low-latency ingestion of the local MediaMTX streams
+INPUT_ARGS = ['-fflags', 'nobuffer', '-flags', 'low_delay', '-rtsp_transport', 'tcp',
+              '-probesize', '1M', '-analyzeduration', '1M']
+
+# "user:password@" in rtsp:// URLs
+_CREDENTIALS_RE = re.compile(r'//[^/@]*@')
+
+
+def is_available():
+    """True if NumPy is installed (needed for the canvas and frame buffers)"""
+    return np is not None
+
+
+def _forward_stderr(process, prefix, output, url=None):
+    """Pass an FFmpeg process's stderr lines to output (the MediaMTX log ingestion) until it exits"""
+    # FFmpeg repeats the input URL in its errors; keep the internal credentials out of the log
+    public_url = _CREDENTIALS_RE.sub('//', url) if url else None
+    def run():
+        try:
+            for raw in process.stderr:
+                line = raw.decode(errors='replace').rstrip()
+                if public_url:
+                    line = line.replace(url, public_url)
+                if line:
+                    output(f"{prefix} {line}")
+        except (OSError, ValueError):
+            pass
+    # The Logger files lines from this thread name as FFmpeg output
+    threading.Thread(target=run, name=MEDIAMTX_OUTPUT_THREAD, daemon=True).start()
+
+
+def _clip(tile, width, height):
+    """(canvas slices, tile slices) of the part of a tile inside the canvas, or None"""
+    x0, y0 = max(tile['x'], 0), max(tile['y'], 0)
+    x1, y1 = min(tile['x'] + tile['w'], width), min(tile['y'] + tile['h'], height)
+    if x0 >= x1 or y0 >= y1:
+        return None
+    return ((slice(y0, y1), slice(x0, x1)),
+            (slice(y0 - tile['y'], y1 - tile['y']), slice(x0 - tile['x'], x1 - tile['x'])))
+
+
+class TileDecoder:
+    """
+    FFmpeg process decoding one source to raw RGB frames at a tile size and rate.
+
+    Frames are read into one of two preallocated buffers that are swapped once a
+    frame is complete, so the compositor always copies a whole frame. When the
+    process ends (source gone, MediaMTX restarted) the last frame stays in place
+    and the decoder is restarted with backoff.
+    """
+
+    RESTART_DELAY = 2
+    RESTART_DELAY_MAX = 30
+
+    def __init__(self, ffmpeg_exe, source, width, height, fps, input_args=None, decode_args=None, output=print):
+        self.ffmpeg_exe = ffmpeg_exe
+        self.source = source
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.input_args = INPUT_ARGS if input_args is None else input_args
+        self.decode_args = decode_args or []
+        self.output = output        # Receives FFmpeg's stderr lines
+        self.process = None
+        self.seq = 0                # Bumped for every complete frame
+        self.frame_time = 0
+        self.restarts = 0
+        self.users = 0              # Layout tiles showing this decoder
+        self._frames = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='tile-decoder', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._kill()
+
+    def copy_to(self, target, region=(slice(None), slice(None))):
+        """Copy (a region of) the latest frame into target; returns its seq"""
+        with self._lock:
+            target[...] = self._frames[0][region]
+            return self.seq
+
+    def _command(self):
+        return [
+            self.ffmpeg_exe,
+            '-hide_banner', '-loglevel', 'error', '-nostdin',
+            *self.input_args, *self.decode_args,
+            '-i', self.source,
+            '-an',
+            '-vf', f'fps={self.fps},scale={self.width}:{self.height}',
+            '-pix_fmt', 'rgb24', '-f', 'rawvideo',
+            'pipe:1'
+        ]
+
+    def _run(self):
+        delay = self.RESTART_DELAY
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                self.process = subprocess.Popen(self._command(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+                _forward_stderr(self.process, f"[GridFusion decoder {self.source.rsplit('/', 1)[-1]}]", self.output,
+                                url=self.source)
+                self._read_frames(self.process.stdout)
+            except OSError as e:
+                print(f"  GridFusion decoder for {self.source} failed: {e}")
+            self._kill()
+            if self._stop.is_set():
+                break
+            # A decoder that ran for a while gets a fresh backoff
+            if time.time() - started > 60:
+                delay = self.RESTART_DELAY
+            self.restarts += 1
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.RESTART_DELAY_MAX)
+
+    def _read_frames(self, stdout):
+        frame_size = self.width * self.height * 3
+        while not self._stop.is_set():
+            view = memoryview(self._frames[1]).cast('B')
+            filled = 0
+            while filled < frame_size:
+                count = stdout.readinto(view[filled:])
+                if not count:
+                    return
+                filled += count
+            with self._lock:
+                self._frames.reverse()
+                self.seq += 1
+                self.frame_time = time.time()
+
+    def _kill(self):
+        process = self.process
+        if process and process.poll() is None:
+            try:
+                process.kill()
+                process.wait(timeout=2)
+            except Exception:
+                pass
+
+
+class LayoutCompositor:
+    """
+    Composes one layout at its output rate and pipes the canvas to an encoder.
+
+    Only tiles whose decoder produced a new frame are copied, plus tiles drawn on
+    top of them (always-on-top tiles come last). The canvas persists between frames,
+    so a stalled source just keeps its last frame.
+    """
+
+    RESTART_DELAY = 2
+    RESTART_DELAY_MAX = 30
+
+    def __init__(self, ffmpeg_exe, width, height, fps, output_args, name='', output=print):
+        self.ffmpeg_exe = ffmpeg_exe
+        self.name = name
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.output_args = output_args
+        self.output = output        # Receives the encoder's stderr lines
+        self.encoder = None
+        self.frames = 0             # Frames sent to the encoder
+        self.blits = 0              # Tile copies into the canvas
+        self.restarts = 0
+        self.canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        self._placements = []       # [(tile, decoder, clip)] in drawing order
+        self._seen = []             # Decoder seq last copied, per placement
+        self._redraw_all = True
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def matches(self, width, height, fps, output_args):
+        return (self.width, self.height, self.fps, self.output_args) == (width, height, fps, output_args)
+
+    def set_tiles(self, placements):
+        """Replace the [(tile, decoder)] list; takes effect on the next frame"""
+        with self._lock:
+            self._placements = [(tile, decoder, _clip(tile, self.width, self.height)) for tile, decoder in placements]
+            self._seen = [None] * len(self._placements)
+            self._redraw_all = True
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='gridfusion-compositor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._kill_encoder()
+
+    def _encoder_command(self):
+        return [
+            self.ffmpeg_exe,
+            '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{self.width}x{self.height}', '-r', str(self.fps),
+            '-i', 'pipe:0',
+            # 4:2:0 that libx264 and the hardware encoders all accept (RGB input would pick 4:4:4)
+            '-pix_fmt', 'nv12',
+            *self.output_args
+        ]
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        delay = self.RESTART_DELAY
+        retry_at = 0
+        encoder_started = 0
+        next_frame = time.monotonic()
+        while not self._stop.is_set():
+            if self.encoder is None or self.encoder.poll() is not None:
+                if self.encoder is not None:
+                    self._kill_encoder()
+                    self.restarts += 1
+                    retry_at = time.monotonic() + delay
+                    delay = min(delay * 2, self.RESTART_DELAY_MAX)
+                if time.monotonic() >= retry_at:
+                    try:
+                        self.encoder = subprocess.Popen(self._encoder_command(), stdin=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+                        _forward_stderr(self.encoder, f"[GridFusion encoder {self.name}]", self.output)
+                        encoder_started = time.monotonic()
+                    except OSError as e:
+                        print(f"  GridFusion encoder failed to start: {e}")
+                        retry_at = time.monotonic() + delay
+
+            with self._lock:
+                self._compose()
+
+            if self.encoder is not None and self.encoder.poll() is None:
+                try:
+                    self.encoder.stdin.write(self.canvas.data)
+                    self.frames += 1
+                    if time.monotonic() - encoder_started > 60:
+                        delay = self.RESTART_DELAY
+                except (BrokenPipeError, OSError):
+                    self._kill_encoder()
+
+            next_frame += interval
+            wait = next_frame - time.monotonic()
+            if wait < -interval:
+                # Fell behind (slow encoder or host); resync instead of bursting
+                next_frame = time.monotonic()
+                wait = 0
+            self._stop.wait(max(wait, 0))
+
+    def _compose(self):
+        """Copy tiles with new frames into the canvas (called with the lock held)"""
+        count = len(self._placements)
+        if self._redraw_all:
+            self.canvas.fill(0)
+        redraw = [self._redraw_all or decoder.seq != seen for (_, decoder, _), seen in zip(self._placements, self._seen)]
+        self._redraw_all = False
+        for i in range(count):
+            if not redraw[i]:
+                continue
+            tile, decoder, clip = self._placements[i]
+            if clip:
+                canvas_region, tile_region = clip
+                self._seen[i] = decoder.copy_to(self.canvas[canvas_region], tile_region)
+                self.blits += 1
+            # Tiles drawn above this one have to be drawn again on top of it
+            for j in range(i + 1, count):
+                if not redraw[j] and compositor.overlaps(tile, self._placements[j][0]):
+                    redraw[j] = True
+
+    def _kill_encoder(self):
+        encoder = self.encoder
+        if encoder is None:
+            return
+        try:
+            encoder.stdin.close()
+        except Exception:
+            pass
+        try:
+            encoder.kill()
+            encoder.wait(timeout=2)
+        except Exception:
+            pass
+
+
+class FrameCompositor:
+    """
+    Runs the GridFusion layouts in-process.
+
+    Decoders are shared: tiles showing the same source at the same size and rate
+    (in any layout) read from one decoder. apply() reconciles the running layouts
+    and decoders with a new set of composites, so geometry or camera changes only
+    start and stop the decoders that are actually affected.
+
+    FFmpeg stderr lines go to output (MediaMTXManager passes its log ingestion).
+    """
+
+    def __init__(self, output=print):
+        self.output = output
+        self._decoders = {}     # (source, w, h, fps) -> TileDecoder
+        self._layouts = {}      # layout id -> LayoutCompositor
+        self._lock = threading.Lock()
+
+    def apply(self, ffmpeg_exe, composites, input_args=None):
+        """
+        composites: [{'id', 'width', 'height', 'fps', 'tiles', 'urls', 'source_fps', 'output_args'}]
+        with one url and source rate per tile, and the encoder's output arguments.
+        """
+        with self._lock:
+            old_decoders = dict(self._decoders)
+            for decoder in old_decoders.values():
+                decoder.users = 0
+
+            for composite in composites:
+                layout = self._layouts.get(composite['id'])
+                if layout and not layout.matches(composite['width'], composite['height'], composite['fps'], composite['output_args']):
+                    layout.stop()
+                    layout = None
+                if layout is None:
+                    layout = LayoutCompositor(ffmpeg_exe, composite['width'], composite['height'],
+                                              composite['fps'], composite['output_args'],
+                                              name=composite['id'], output=self.output)
+                    self._layouts[composite['id']] = layout
+                    layout.start()
+
+                placements = []
+                for tile, url, src_fps in zip(composite['tiles'], composite['urls'], composite['source_fps']):
+                    key = (url, tile['w'], tile['h'], composite['fps'])
+                    decoder = self._decoders.get(key)
+                    if decoder is None:
+                        decode_args = compositor.decode_options(src_fps, composite['fps']).split()
+                        decoder = TileDecoder(ffmpeg_exe, url, tile['w'], tile['h'], composite['fps'],
+                                              input_args=input_args, decode_args=decode_args, output=self.output)
+                        self._decoders[key] = decoder
+                        decoder.start()
+                    decoder.users += 1
+                    placements.append((tile, decoder))
+                layout.set_tiles(placements)
+
+            active = {composite['id'] for composite in composites}
+            for layout_id in list(self._layouts):
+                if layout_id not in active:
+                    self._layouts.pop(layout_id).stop()
+            for key, decoder in list(self._decoders.items()):
+                if decoder.users == 0:
+                    del self._decoders[key]
+                    decoder.stop()
+
+            started = len(set(self._decoders) - set(old_decoders))
+            stopped = len(set(old_decoders) - set(self._decoders))
+            print(f"      GridFusion compositor: {len(self._layouts)} layouts, {len(self._decoders)} decoders "
+                  f"(started: {started}, stopped: {stopped})")
+
+    def stop(self):
+        with self._lock:
+            for layout in self._layouts.values():
+                layout.stop()
+            for decoder in self._decoders.values():
+                decoder.stop()
+            self._layouts.clear()
+            self._decoders.clear()
+
+    def is_running(self):
+        return bool(self._layouts)
+
+    def get_stats(self):
+        with self._lock:
+            now = time.time()
+            return {
+                'layouts': {layout_id: {'frames': layout.frames, 'blits': layout.blits, 'encoderRestarts': layout.restarts}
+                            for layout_id, layout in self._layouts.items()},
+                'decoders': [{'source': decoder.source, 'size': f'{decoder.width}x{decoder.height}', 'fps': decoder.fps,
+                              'frames': decoder.seq, 'users': decoder.users, 'restarts': decoder.restarts,
+                              'frameAge': round(now - decoder.frame_time, 1) if decoder.frame_time else None}
+                             for decoder in self._decoders.values()],
+            }
+
+
+# --- Benchmark ---
+
+def _grid(count, width, height):
+    cols = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / cols)
+    # Even tile sizes keep yuv420p scaling exact
+    w, h = (width // cols) & ~1, (height // rows) & ~1
+    return [{'x': (i % cols) * w, 'y': (i // cols) * h, 'w': w, 'h': h} for i in range(count)]
+
+
+def _cpu_seconds(processes):
+    total = 0.0
+    for process in processes:
+        try:
+            times = process.cpu_times()
+            total += times.user + times.system
+        except psutil.Error:
+            pass
+    return total
+
+
+def benchmark(ffmpeg_exe, sources=4, layouts=1, width=1920, height=1080, fps=5,
+              source_size='1280x720', source_fps=15, seconds=20):
+    """
+    Compare the FFmpeg filter-graph backend with the in-process compositor.
+
+    Every layout shows all `sources` testsrc inputs in a grid and is encoded with
+    libx264 to a null output. Returns {backend: {'cpuSeconds', 'frames', 'cpuPerFrame'}}
+    with frames counted per layout output.
+    """
+    tiles = _grid(sources, width, height)
+    srcs = [f'testsrc=size={source_size}:rate={source_fps}' for _ in range(sources)]
+    # Hue-shift each input so the sources are distinct
+    srcs = [f'{src},hue=h={i * 10}' for i, src in enumerate(srcs)]
+    encode = '-c:v libx264 -preset veryfast -tune zerolatency'
+    results = {}
+
+    # FFmpeg backend: the shared filter graph build_config() generates
+    from .ffmpeg_manager import FFmpegManager
+    mode = compositor.choose_mode(tiles, width, height, FFmpegManager().get_ffmpeg_version(ffmpeg_exe))
+    composites = [{'tiles': tiles, 'width': width, 'height': height, 'fps': fps, 'mode': mode,
+                   'inputs': list(range(sources)), 'output': f'out{n}'} for n in range(layouts)]
+    cmd = [ffmpeg_exe, '-hide_banner', '-loglevel', 'error', '-nostdin', '-nostats', '-progress', 'pipe:1']
+    for src in srcs:
+        cmd += ['-re', '-f', 'lavfi', '-i', src]
+    cmd += ['-filter_complex', compositor.build_shared_filter_complex(composites)]
+    for composite in composites:
+        cmd += ['-map', f'[{composite["output"]}]', *shlex.split(encode), '-r', str(fps), '-f', 'null', '-']
+    print(f"Benchmarking FFmpeg backend ({sources} sources, {layouts} layouts, {seconds}s)...")
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    frames = 0
+
+    def read_progress():
+        nonlocal frames
+        for line in process.stdout:
+            if line.startswith('frame='):
+                frames = int(line.split('=', 1)[1] or 0)
+    reader = threading.Thread(target=read_progress, daemon=True)
+    reader.start()
+    time.sleep(seconds)
+    cpu = _cpu_seconds([psutil.Process(process.pid)])
+    process.kill()
+    process.wait()
+    reader.join(timeout=2)
+    results['ffmpeg'] = {'cpuSeconds': round(cpu, 2), 'frames': frames, 'cpuPerFrame': round(cpu / frames, 4) if frames else None}
+
+    # In-process backend
+    if not is_available():
+        print("NumPy not installed, skipping the in-process compositor (pip install numpy)")
+        return results
+    engine = FrameCompositor()
+    this = psutil.Process()
+    cpu_before = _cpu_seconds([this])
+    engine.apply(ffmpeg_exe, [{'id': f'bench{n}', 'width': width, 'height': height, 'fps': fps, 'tiles': tiles,
+                               'urls': srcs, 'source_fps': [source_fps] * sources,
+                               'output_args': shlex.split(encode) + ['-f', 'null', '-']} for n in range(layouts)],
+                 input_args=['-re', '-f', 'lavfi'])
+    print(f"Benchmarking in-process compositor ({sources} sources, {layouts} layouts, {seconds}s)...")
+    time.sleep(seconds)
+    cpu = _cpu_seconds([this] + this.children(recursive=True)) - cpu_before
+    frames = sum(stats['frames'] for stats in engine.get_stats()['layouts'].values()) // layouts
+    engine.stop()
+    results['python'] = {'cpuSeconds': round(cpu, 2), 'frames': frames, 'cpuPerFrame': round(cpu / frames, 4) if frames else None}
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    from .ffmpeg_manager import FFmpegManager
+
+    parser = argparse.ArgumentParser(description='Benchmark the GridFusion compositor backends with testsrc inputs')
+    parser.add_argument('--sources', type=int, default=4)
+    parser.add_argument('--layouts', type=int, default=1)
+    parser.add_argument('--resolution', default='1920x1080')
+    parser.add_argument('--fps', type=int, default=5)
+    parser.add_argument('--source-size', default='1280x720')
+    parser.add_argument('--source-fps', type=int, default=15)
+    parser.add_argument('--seconds', type=int, default=20)
+    parser.add_argument('--ffmpeg', default=None, help='FFmpeg binary (default: the one the server uses)')
+    args = parser.parse_args()
+
+    res_w, res_h = map(int, args.resolution.split('x'))
+    results = benchmark(args.ffmpeg or FFmpegManager().get_ffmpeg_path(), sources=args.sources, layouts=args.layouts,
+                        width=res_w, height=res_h, fps=args.fps, source_size=args.source_size,
+                        source_fps=args.source_fps, seconds=args.seconds)
+    print()
+    for backend, result in results.items():
+        print(f"  {backend:7} cpu {result['cpuSeconds']:7.2f}s  frames {result['frames']:6}  cpu/frame {result['cpuPerFrame']}")
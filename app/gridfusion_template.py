@@ -816,6 +816,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                     <div class="prop-item" style="grid-column: span 2;">
                         <span class="prop-label">Stream Type</span>
                         <select id="prop-stream" class="prop-input" onchange="manualPropUpdate()">
+                            <option value="auto">Auto (by tile size)</option>
                             <option value="main">Main (High Res)</option>
                             <option value="sub">Sub (Low Res)</option>
                         </select>
@@ -1141,7 +1142,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
         async function updateDebugStats() {{
             try {{
                 const [debugResp, statsResp, analyticsResp] = await Promise.all([
-                    fetch('/api/gridfusion/debug'),
+                    fetch('/api/gridfusion/debug?layout=' + encodeURIComponent(gfConfig.id)),
                     fetch('/api/stats'),
                     fetch('/api/analytics')
                 ]);
@@ -1229,20 +1230,46 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                     fetch('/api/analytics')
                 ]);
                 
-                const stats = await statsResp.json();
-                const analytics = await analyticsResp.json();
-                
-                if (stats.cpu_percent !== undefined) {{
-                    let totalBitrate = 0;
-                    Object.values(analytics).forEach(a => totalBitrate += (a.bitrate || 0));
-                    
-                    document.getElementById('server-stats').innerHTML = 
-                        `<i class="fas fa-server" style="color: var(--accent-color);"></i> CPU: ${{stats.cpu_percent}}% • MEM: ${{stats.memory_mb}}MB • NET: ${{totalBitrate.toFixed(0)}} kbps`;
-                }}
+                latestStats = await statsResp.json();
+                latestAnalytics = await analyticsResp.json();
+                renderStats();
             }} catch (e) {{
                 console.error("Stats fetch failed:", e);
             }}
         }}
+        
+        // Latest values (from polling or the event stream)
+        let latestStats = {{}};
+        let latestAnalytics = {{}};
+        
+        function renderStats() {{
+            const stats = latestStats;
+            if (stats.cpu_percent !== undefined) {{
+                let totalBitrate = 0;
+                Object.values(latestAnalytics).forEach(a => totalBitrate += (a.bitrate || 0));
+                
+                document.getElementById('server-stats').innerHTML = 
+                    `<i class="fas fa-server" style="color: var(--accent-color);"></i> CPU: ${{stats.cpu_percent}}% • MEM: ${{stats.memory_mb}}MB • NET: ${{totalBitrate.toFixed(0)}} kbps`;
+            }}
+        }}
+        
+        // Server-Sent Events replace stats polling while connected
+        let eventsConnected = false;
+        
+        function connectEvents() {{
+            if (!window.EventSource) return;
+            const es = new EventSource('/api/events');
+            es.onopen = () => {{ eventsConnected = true; }};
+            es.onerror = () => {{ eventsConnected = false; }};
+            es.addEventListener('stats', e => {{
+                latestStats = JSON.parse(e.data);
+                renderStats();
+            }});
+            es.addEventListener('analytics', e => {{
+                latestAnalytics = JSON.parse(e.data);
+                renderStats();
+            }});
+        }}
 
         // Initialize
         async function init() {{
@@ -1259,9 +1286,12 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
             // Auto refresh snapshots after short delay
             setTimeout(refreshSnapshots, 1000);
 
-            // Stats polling
+            // Stats: pushed over the event stream, polling while it is down
             updateStats();
-            setInterval(updateStats, 3000);
+            connectEvents();
+            setInterval(() => {{
+                if (!eventsConnected) updateStats();
+            }}, 3000);
         }}
 
         function handleGlobalKeydown(e) {{
@@ -1434,11 +1464,12 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 // Build RTSP URL for this camera
                 const port = appSettings.rtspPort || 8554;
                 const hostname = window.location.hostname;
-                const streamPath = gfCam.stream_type === 'main' ? cam.name : `${{cam.name}}_sub`;
+                const streamType = resolveStreamType(gfCam, cam);
+                const streamPath = streamType === 'main' ? cam.name : `${{cam.name}}_sub`;
                 const rtspUrl = `rtsp://${{hostname}}:${{port}}/${{streamPath}}`;
                 
                 // Build enhanced tooltip content
-                const streamTypeLabel = gfCam.stream_type === 'main' ? 'Main Stream (High Res)' : 'Sub Stream (Low Res)';
+                const streamTypeLabel = (streamType === 'main' ? 'Main Stream (High Res)' : 'Sub Stream (Low Res)') + (gfCam.stream_type === 'main' || gfCam.stream_type === 'sub' ? '' : ' - Auto');
                 const layerInfo = gfCam.always_on_top ? 'Always on Top' : 'Normal Layer';
                 const statusLabel = cam.status.charAt(0).toUpperCase() + cam.status.slice(1);
                 
@@ -1476,8 +1507,9 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                             ${{cameras.map(c => `\u003coption value=\"${{c.id}}\" ${{c.id === gfCam.id ? 'selected' : ''}}\u003e${{c.name}}\u003c/option\u003e`).join('')}}\r
                         \u003c/select\u003e\r
                         \u003cselect class=\"stream-switcher\" onchange=\"changeStreamType(${{idx}}, this.value)\" onpointerdown=\"event.stopPropagation()\" onclick=\"event.stopPropagation()\" title=\"Switch Stream\"\u003e\r
+                            \u003coption value=\"auto\" ${{gfCam.stream_type !== 'main' && gfCam.stream_type !== 'sub' ? 'selected' : ''}}\u003eAuto\u003c/option\u003e\r
                             \u003coption value=\"main\" ${{gfCam.stream_type === 'main' ? 'selected' : ''}}\u003eMain\u003c/option\u003e\r
-                            \u003coption value=\"sub\" ${{gfCam.stream_type !== 'main' ? 'selected' : ''}}\u003eSub\u003c/option\u003e\r
+                            \u003coption value=\"sub\" ${{gfCam.stream_type === 'sub' ? 'selected' : ''}}\u003eSub\u003c/option\u003e\r
                         \u003c/select\u003e\r
                         \u003cdiv class=\"ontop-badge ${{gfCam.always_on_top ? 'active' : ''}}\" \r
                              onpointerdown=\"event.stopPropagation()\" \r
@@ -1514,6 +1546,12 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
             renderGrid();
         }}
         
+        // Mirrors the server: 'auto' uses the sub stream when its resolution covers the tile
+        function resolveStreamType(gfCam, cam) {{
+            if (gfCam.stream_type === 'main' || gfCam.stream_type === 'sub') return gfCam.stream_type;
+            return (cam.subWidth || 0) >= gfCam.w && (cam.subHeight || 0) >= gfCam.h ? 'sub' : 'main';
+        }}
+        
         function changeStreamType(idx, type) {{
             gfConfig.cameras[idx].stream_type = type;
             renderGrid();
@@ -1555,7 +1593,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 y: 0,
                 w: 640,
                 h: 360,
-                stream_type: 'sub',
+                stream_type: 'auto',
                 always_on_top: false
             }});
             
@@ -1676,7 +1714,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
             if (document.activeElement.id !== 'prop-y') document.getElementById('prop-y').value = Math.round(cam.y);
             if (document.activeElement.id !== 'prop-w') document.getElementById('prop-w').value = Math.round(cam.w);
             if (document.activeElement.id !== 'prop-h') document.getElementById('prop-h').value = Math.round(cam.h);
-            document.getElementById('prop-stream').value = cam.stream_type || 'sub';
+            document.getElementById('prop-stream').value = cam.stream_type || 'auto';
             document.getElementById('prop-on-top').checked = !!cam.always_on_top;
         }}
 
@@ -1862,37 +1900,37 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
 
             // Grid logic based on common NVR/VMS layouts
             if (count === 1) {{
-                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: maxW, h: maxH, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: maxW, h: maxH, stream_type: 'auto', always_on_top: false }});
             }}
             else if (count === 2) {{
                 // Side by side
-                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: maxW/2, h: maxH, stream_type: 'sub', always_on_top: false }});
-                newLayout.push({{ id: availableCams[1 % availableCams.length].id, x: maxW/2, y: 0, w: maxW/2, h: maxH, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: maxW/2, h: maxH, stream_type: 'auto', always_on_top: false }});
+                newLayout.push({{ id: availableCams[1 % availableCams.length].id, x: maxW/2, y: 0, w: maxW/2, h: maxH, stream_type: 'auto', always_on_top: false }});
             }}
             else if (count === 3) {{
                 // 1 big on left, 2 small on right
-                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: (maxW*2)/3, h: maxH, stream_type: 'sub', always_on_top: false }});
-                newLayout.push({{ id: availableCams[1 % availableCams.length].id, x: (maxW*2)/3, y: 0, w: maxW/3, h: maxH/2, stream_type: 'sub', always_on_top: false }});
-                newLayout.push({{ id: availableCams[2 % availableCams.length].id, x: (maxW*2)/3, y: maxH/2, w: maxW/3, h: maxH/2, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: (maxW*2)/3, h: maxH, stream_type: 'auto', always_on_top: false }});
+                newLayout.push({{ id: availableCams[1 % availableCams.length].id, x: (maxW*2)/3, y: 0, w: maxW/3, h: maxH/2, stream_type: 'auto', always_on_top: false }});
+                newLayout.push({{ id: availableCams[2 % availableCams.length].id, x: (maxW*2)/3, y: maxH/2, w: maxW/3, h: maxH/2, stream_type: 'auto', always_on_top: false }});
             }}
             else if (count === 4) {{
                 // 2x2
                 for (let i=0; i<4; i++) {{
-                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%2)*(maxW/2), y: Math.floor(i/2)*(maxH/2), w: maxW/2, h: maxH/2, stream_type: 'sub', always_on_top: false }});
+                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%2)*(maxW/2), y: Math.floor(i/2)*(maxH/2), w: maxW/2, h: maxH/2, stream_type: 'auto', always_on_top: false }});
                 }}
             }}
             else if (count === 5 || count === 6) {{
                 // 1 large (2x2 units), rest small (1x1 units) in a 3x3 grid
                 const unitW = maxW/3, unitH = maxH/3;
-                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: unitW*2, h: unitH*2, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: unitW*2, h: unitH*2, stream_type: 'auto', always_on_top: false }});
                 // Right Column
-                newLayout.push({{ id: availableCams[1 % availableCams.length].id, x: unitW*2, y: 0, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
-                newLayout.push({{ id: availableCams[2 % availableCams.length].id, x: unitW*2, y: unitH, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[1 % availableCams.length].id, x: unitW*2, y: 0, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
+                newLayout.push({{ id: availableCams[2 % availableCams.length].id, x: unitW*2, y: unitH, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                 // Bottom Column
-                newLayout.push({{ id: availableCams[3 % availableCams.length].id, x: 0, y: unitH*2, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
-                newLayout.push({{ id: availableCams[4 % availableCams.length].id, x: unitW, y: unitH*2, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[3 % availableCams.length].id, x: 0, y: unitH*2, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
+                newLayout.push({{ id: availableCams[4 % availableCams.length].id, x: unitW, y: unitH*2, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                 if (count === 6) {{
-                    newLayout.push({{ id: availableCams[5 % availableCams.length].id, x: unitW*2, y: unitH*2, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                    newLayout.push({{ id: availableCams[5 % availableCams.length].id, x: unitW*2, y: unitH*2, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                 }}
             }}
             else if (count >= 7 && count <= 9) {{
@@ -1900,20 +1938,20 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 const cols = 3, rows = 3;
                 const unitW = maxW/cols, unitH = maxH/rows;
                 for (let i=0; i<count; i++) {{
-                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                 }}
             }}
             else if (count >= 10 && count <= 13) {{
                 // 1 big (3x3 units), rest small (1x1 units) in a 4x4 grid
                 const unitW = maxW/4, unitH = maxH/4;
-                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: unitW*3, h: unitH*3, stream_type: 'sub', always_on_top: false }});
+                newLayout.push({{ id: availableCams[0].id, x: 0, y: 0, w: unitW*3, h: unitH*3, stream_type: 'auto', always_on_top: false }});
                 // Find empty slots in 4x4
                 let idx = 1;
                 for (let r=0; r<4; r++) {{
                     for (let c=0; c<4; c++) {{
                         if (r < 3 && c < 3) continue; // occupied by large
                         if (idx < count) {{
-                            newLayout.push({{ id: availableCams[idx % availableCams.length].id, x: c*unitW, y: r*unitH, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                            newLayout.push({{ id: availableCams[idx % availableCams.length].id, x: c*unitW, y: r*unitH, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                             idx++;
                         }}
                     }}
@@ -1924,7 +1962,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 const cols = 4, rows = 4;
                 const unitW = maxW/cols, unitH = maxH/rows;
                 for (let i=0; i<count; i++) {{
-                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                 }}
             }}
             else if (count >= 17 && count <= 25) {{
@@ -1932,7 +1970,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 const cols = 5, rows = 5;
                 const unitW = maxW/cols, unitH = maxH/rows;
                 for (let i=0; i<count; i++) {{
-                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'sub', always_on_top: false }});
+                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'auto', always_on_top: false }});
                 }}
             }}
             else {{
@@ -1940,7 +1978,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 const cols = 6, rows = 5;
                 const unitW = maxW/cols, unitH = maxH/rows;
                 for (let i=0; i<count; i++) {{
-                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'sub' }});
+                    newLayout.push({{ id: availableCams[i % availableCams.length].id, x: (i%cols)*unitW, y: Math.floor(i/cols)*unitH, w: unitW, h: unitH, stream_type: 'auto' }});
                 }}
             }}
             
@@ -1968,7 +2006,7 @@ def get_gridfusion_html(current_settings=None, grid_fusion_config=None):
                 y: y - 56,
                 w: 200,
                 h: 112,
-                stream_type: 'sub'
+                stream_type: 'auto'
             }});
             renderGrid();
         }};
@@ -3,9 +3,45 @@ import platform
 import os
 import re
 import time
+from . import netlink
+from . import dhcp
 
 class LinuxNetworkManager:
-    """Manages Linux network interfaces for virtual cameras"""
+    """
+    Manages Linux network interfaces for virtual cameras.
+    
+    Links, addresses and ARP sysctls are managed in-process over rtnetlink and
+    /proc/sys, and DHCP leases by the built-in client. Without the privileges for
+    that (not root / no CAP_NET_ADMIN or CAP_NET_RAW) it falls back to running
+    'sudo ip', 'sudo sysctl' and dhclient.
+    """
+    
+    DHCP_TIMEOUT = 10   # Seconds a camera start waits for its lease
+    
+    # Shared by all cameras, cleared after the first permission error
+    _netlink = netlink.Netlink() if netlink.is_available() else None
+    _dhcp = dhcp.DHCPClient() if dhcp.is_available() else None
+    
+    @classmethod
+    def _disable_netlink(cls, error):
+        if cls._netlink:
+            print(f"  Netlink not permitted ({error}), falling back to 'sudo ip'")
+            cls._netlink = None
+    
+    @classmethod
+    def _disable_dhcp(cls, error):
+        if cls._dhcp:
+            print(f"  Built-in DHCP client not permitted ({error}), falling back to dhclient")
+            cls._dhcp = None
+    
+    @classmethod
+    def get_dhcp_lease(cls, name):
+        """Lease state of an interface from the built-in DHCP client, or None"""
+        return cls._dhcp.get_lease(name) if cls._dhcp else None
+    
+    @classmethod
+    def get_dhcp_leases(cls):
+        return cls._dhcp.get_leases() if cls._dhcp else []
     
     @staticmethod
     def is_linux():
@@ -48,6 +84,23 @@ class LinuxNetworkManager:
                 print(f"   Available interfaces: {', '.join(available)}")
             return False
 
+        nl = self._netlink
+        if nl:
+            try:
+                # Same steps as below, without spawning processes
+                print(f"  Enabling promiscuous mode on {parent_if}...")
+                nl.set_link_flags(parent_if, netlink.IFF_PROMISC, netlink.IFF_PROMISC)
+                nl.delete_link(name)
+                nl.create_macvlan(name, parent_if, mac, up=True)
+                self._set_arp_isolation(name)
+                return True
+            except PermissionError as e:
+                self._disable_netlink(e)
+            except (OSError, ValueError) as e:
+                # ValueError: malformed MAC address
+                print(f"Error creating MACVLAN: {e}")
+                return False
+
         try:
             # 1. Enable promiscuous mode on parent (often required for MACVLAN to work)
             print(f"  Enabling promiscuous mode on {parent_if}...")
@@ -65,16 +118,48 @@ class LinuxNetworkManager:
             # 5. Bring it up
             subprocess.run(['sudo', 'ip', 'link', 'set', name, 'up'], check=True)
 
-            # 6. Apply ARP isolation to prevent host from "hijacking" the virtual IP (ARP Flux)
-            # This is crucial for stability when multiple IPs are on one physical interface
-            subprocess.run(['sudo', 'sysctl', '-w', f'net.ipv4.conf.{name}.arp_ignore=1'], check=False)
-            subprocess.run(['sudo', 'sysctl', '-w', f'net.ipv4.conf.{name}.arp_announce=2'], check=False)
+            # 6. Apply ARP isolation
+            self._set_arp_isolation(name)
             
             return True
         except subprocess.CalledProcessError as e:
             print(f"Error creating MACVLAN: {e}")
             return False
 
+    def _set_arp_isolation(self, name):
+        """Prevent the host from "hijacking" the virtual IP (ARP Flux)"""
+        # This is crucial for stability when multiple IPs are on one physical interface
+        for key, value in ((f'net.ipv4.conf.{name}.arp_ignore', 1), (f'net.ipv4.conf.{name}.arp_announce', 2)):
+            try:
+                netlink.write_sysctl(key, value)
+            except OSError:
+                subprocess.run(['sudo', 'sysctl', '-w', f'{key}={value}'], check=False)
+
+    def _get_ip(self, name):
+        """Current IPv4 address of an interface, or None"""
+        if self._netlink:
+            try:
+                return self._netlink.get_ipv4(name)
+            except OSError:
+                pass
+        result = subprocess.run(['ip', '-4', 'addr', 'show', name], capture_output=True, text=True)
+        match = re.search(r'inet (\d+\.\d+\.\d+\.\d+)', result.stdout)
+        return match.group(1) if match else None
+
+    def _wait_for_ip(self, name, timeout):
+        """Wait for an IPv4 address (netlink notification, or polling without netlink)"""
+        if self._netlink:
+            try:
+                return self._netlink.wait_for_ipv4(name, timeout)
+            except OSError:
+                pass
+        deadline = time.time() + timeout
+        while True:
+            assigned_ip = self._get_ip(name)
+            if assigned_ip or time.time() >= deadline:
+                return assigned_ip
+            time.sleep(1)
+
     def setup_ip(self, name, mode, ip=None, mask=None, gw=None):
         """Setup IP address using DHCP or Static"""
         if not self.is_linux():
@@ -82,6 +167,21 @@ class LinuxNetworkManager:
             
         try:
             if mode == 'dhcp':
+                if self._dhcp:
+                    try:
+                        print(f"  Requesting DHCP for {name} (timeout {self.DHCP_TIMEOUT}s)...")
+                        assigned_ip = self._dhcp.acquire(name, timeout=self.DHCP_TIMEOUT)
+                        if assigned_ip:
+                            print(f"  ✓ IP assigned: {assigned_ip}")
+                            return assigned_ip
+                        print("  DHCP failed to acquire address in time.")
+                        print("     Tip: Try 'Static IP' mode instead if your router is slow to respond.")
+                        return None
+                    except PermissionError as e:
+                        self._disable_dhcp(e)
+                    except OSError as e:
+                        print(f"  Built-in DHCP client failed: {e}")
+                
                 print(f"  Requesting DHCP for {name} (timeout 15s)...")
                 
                 # Try dhclient with a custom config to prevent it from touching host DNS/Routes
@@ -100,17 +200,13 @@ class LinuxNetworkManager:
                     subprocess.run(['sudo', 'dhclient', '-1', '-nw', '-cf', conf_path, name], check=False)
                     
                     # Wait up to 5 seconds for IP (most fast networks respond in 1-2s)
-                    for _ in range(5):
-                        result = subprocess.run(['ip', '-4', 'addr', 'show', name], capture_output=True, text=True)
-                        match = re.search(r'inet (\d+\.\d+\.\d+\.\d+)', result.stdout)
-                        if match:
-                            assigned_ip = match.group(1)
-                            print(f"  IP assigned: {assigned_ip}")
-                            # Clean up temp conf
-                            try: os.remove(conf_path)
-                            except: pass
-                            return assigned_ip
-                        time.sleep(1)
+                    assigned_ip = self._wait_for_ip(name, 5)
+                    if assigned_ip:
+                        print(f"  IP assigned: {assigned_ip}")
+                        # Clean up temp conf
+                        try: os.remove(conf_path)
+                        except: pass
+                        return assigned_ip
                         
                     # Clean up temp conf if failed
                     try: os.remove(conf_path)
@@ -120,43 +216,48 @@ class LinuxNetworkManager:
 
                 # Try udhcpc if dhclient isolated attempt fails
                 try:
-                    print(f"  Isolated DHCP failed, trying 'udhcpc' fallback...")
+                    print("  Isolated DHCP failed, trying 'udhcpc' fallback...")
                     subprocess.run(['sudo', 'udhcpc', '-i', name, '-n', '-q', '-T', '1', '-t', '5', '-s', '/bin/true'], check=True, timeout=7)
                 except:
                     pass
 
                 # Ultimate Fallback: Try plain dhclient (exactly like user's manual command)
                 # Keep this as a last resort as it might touch host routes
-                result = subprocess.run(['ip', '-4', 'addr', 'show', name], capture_output=True, text=True)
-                if not re.search(r'inet \d+', result.stdout):
+                if not self._get_ip(name):
                     try:
-                        print(f"  Standard DHCP attempts failed. Trying plain 'dhclient' (User Success Mode)...")
+                        print("  Standard DHCP attempts failed. Trying plain 'dhclient' (User Success Mode)...")
                         subprocess.run(['sudo', 'dhclient', '-nw', name], check=False)
                         # Wait a bit
-                        for _ in range(3):
-                            result = subprocess.run(['ip', '-4', 'addr', 'show', name], capture_output=True, text=True)
-                            if re.search(r'inet \d+', result.stdout): break
-                            time.sleep(1)
+                        self._wait_for_ip(name, 3)
                     except:
                         pass
                 
                 # Check final result
-                result = subprocess.run(['ip', '-4', 'addr', 'show', name], capture_output=True, text=True)
-                match = re.search(r'inet (\d+\.\d+\.\d+\.\d+)', result.stdout)
-                if match:
-                    assigned_ip = match.group(1)
+                assigned_ip = self._get_ip(name)
+                if assigned_ip:
                     print(f"  ✓ IP assigned: {assigned_ip}")
                     return assigned_ip
                 
-                print(f"  DHCP failed to acquire address in time.")
-                print(f"     Tip: Try 'Static IP' mode instead if your router is slow to respond.")
+                print("  DHCP failed to acquire address in time.")
+                print("     Tip: Try 'Static IP' mode instead if your router is slow to respond.")
                 return None
                     
             elif mode == 'static' and ip:
                 print(f"  Setting static IP {ip} for {name}...")
                 full_ip = f"{ip}/{mask}" if mask else ip
                 # Add the IP address
-                subprocess.run(['sudo', 'ip', 'addr', 'add', full_ip, 'dev', name], check=True)
+                added = False
+                if self._netlink:
+                    try:
+                        self._netlink.add_ipv4(name, ip, netlink.prefix_length(mask) if mask else 32)
+                        added = True
+                    except PermissionError as e:
+                        self._disable_netlink(e)
+                    except (OSError, ValueError) as e:
+                        print(f"Error setting up IP: {e}")
+                        return None
+                if not added:
+                    subprocess.run(['sudo', 'ip', 'addr', 'add', full_ip, 'dev', name], check=True)
                 
                 # IMPORTANT: We do NOT add a 'default gateway' here.
                 # Adding a default route to a virtual interface will override the host's 
@@ -178,11 +279,23 @@ class LinuxNetworkManager:
         print(f"Removing Virtual NIC {name}...")
         try:
             # Release DHCP
-            try:
-                subprocess.run(['sudo', 'dhclient', '-r', name], check=False)
-            except:
-                pass
+            if self._dhcp and self._dhcp.has_lease(name):
+                self._dhcp.release(name)
+            else:
+                try:
+                    subprocess.run(['sudo', 'dhclient', '-r', name], check=False)
+                except:
+                    pass
             # Delete link
+            if self._netlink:
+                try:
+                    self._netlink.delete_link(name)
+                    return
+                except PermissionError as e:
+                    self._disable_netlink(e)
+                except OSError as e:
+                    print(f"Error cleaning up NIC {name}: {e}")
+                    return
             subprocess.run(['sudo', 'ip', 'link', 'delete', name], check=False)
         except Exception as e:
             print(f"Error cleaning up NIC {name}: {e}")
@@ -194,10 +307,16 @@ class LinuxNetworkManager:
             
         print("Cleaning up old virtual network interfaces...")
         try:
-            # Get list of all interfaces
-            result = subprocess.run(['ip', 'link', 'show'], capture_output=True, text=True)
             # Find all interfaces starting with vnic_
-            vnics = re.findall(r'vnic_[^:@\s]+', result.stdout)
+            vnics = None
+            if self._netlink:
+                try:
+                    vnics = [link for link in self._netlink.list_links() if link.startswith('vnic_')]
+                except OSError:
+                    pass
+            if vnics is None:
+                result = subprocess.run(['ip', 'link', 'show'], capture_output=True, text=True)
+                vnics = re.findall(r'vnic_[^:@\s]+', result.stdout)
             
             # Remove duplicates and clean up
             cleaned = []
@@ -0,0 +1,245 @@
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import deque
+
+# "[path cam1_main]" in MediaMTX output
+_PATH_RE = re.compile(r'\[path ([^\]]+)\]')
+
+
+def _path_matches(tag, path):
+    """True if a MediaMTX path tag belongs to path (the camera path also covers its _main/_sub streams)"""
+    if tag == path:
+        return True
+    base, _, suffix = tag.rpartition('_')
+    return suffix in ('main', 'sub') and base == path
+
+
+class LogArchive:
+    """
+    Append-only on-disk log store.
+
+    Records are written as JSON lines into gzip segments that rotate by size; the
+    oldest segments are deleted beyond max_segments. index.json keeps each
+    segment's time range and the stream paths it mentions, so queries only
+    decompress segments that can match and read them line by line.
+
+    Producers only put records on a bounded queue; a single writer thread does
+    all file I/O, and records are dropped (and counted) if the queue is full.
+    """
+
+    SEGMENT_MAX_BYTES = 4 * 1024 * 1024     # Uncompressed bytes per segment
+    MAX_SEGMENTS = 48
+    QUEUE_SIZE = 10000
+    FLUSH_INTERVAL = 2                      # Seconds between flushes of the open segment
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.dropped = 0
+        self.running = False
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._thread = None
+        self._index_lock = threading.Lock()
+        self._segments = []     # [{'file', 'start', 'end', 'lines', 'paths'}], oldest first
+        self._current = None    # Index entry of the open segment
+        self._file = None
+        self._bytes = 0
+
+    def start(self):
+        if self.running:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            print(f"  Log archive disabled: {e}")
+            return
+        self._load_index()
+        self.running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name='log-archive')
+        self._thread.start()
+
+    def stop(self):
+        """Flush everything queued so far and close the open segment"""
+        if not self.running:
+            return
+        self.running = False
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def append(self, record):
+        """Queue a log record ({'ts', 'source', 'level', 'text'}); never blocks"""
+        if not self.running:
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def append_line(self, text, source, level='info'):
+        self.append({'ts': time.time(), 'source': source, 'level': level, 'text': text})
+
+    def query(self, start=None, end=None, path=None, contains=None, limit=500):
+        """
+        Return up to `limit` matching records (the newest ones, oldest first).
+
+        Segments outside [start, end] or that never mention `path` are skipped
+        without being opened. Records match `path` by their [path ...] tag (see
+        _path_matches).
+        """
+        with self._index_lock:
+            segments = [dict(s, paths=set(s['paths'])) for s in self._segments]
+        if contains:
+            contains = contains.lower()
+
+        # Newest `limit` matches
+        results = deque(maxlen=limit)
+        for segment in segments:
+            if start is not None and segment['end'] is not None and segment['end'] < start:
+                continue
+            if end is not None and segment['start'] is not None and segment['start'] > end:
+                continue
+            if path and not any(_path_matches(tag, path) for tag in segment['paths']):
+                continue
+            for record in self._read_segment(segment['file']):
+                ts = record.get('ts', 0)
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts > end:
+                    break
+                if path and not _path_matches(record.get('path', ''), path):
+                    continue
+                if contains and contains not in record.get('text', '').lower():
+                    continue
+                results.append(record)
+        return list(results)
+
+    def get_segments(self):
+        with self._index_lock:
+            return [dict(s) for s in self._segments]
+
+    def _read_segment(self, filename):
+        """Yield records from a segment; tolerates the open segment's unfinished tail"""
+        try:
+            with gzip.open(os.path.join(self.directory, filename), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except (OSError, EOFError, zlib.error):
+            # Missing file or gzip stream still being written
+            return
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), 'r') as f:
+                segments = json.load(f)
+        except (OSError, ValueError):
+            segments = []
+        self._segments = [s for s in segments if os.path.exists(os.path.join(self.directory, s['file']))]
+
+    def _save_index(self):
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        with self._index_lock:
+            data = [dict(s, paths=sorted(s['paths'])) for s in self._segments]
+        try:
+            tmp = path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            self._write_error(e)
+
+    def _open_segment(self, ts):
+        filename = f"segment-{int(ts * 1000)}.jsonl.gz"
+        self._file = gzip.open(os.path.join(self.directory, filename), 'ab')
+        self._bytes = 0
+        self._current = {'file': filename, 'start': ts, 'end': ts, 'lines': 0, 'paths': set()}
+        with self._index_lock:
+            self._segments.append(self._current)
+            expired = self._segments[:-self.MAX_SEGMENTS]
+            del self._segments[:-self.MAX_SEGMENTS]
+        for segment in expired:
+            try:
+                os.remove(os.path.join(self.directory, segment['file']))
+            except OSError:
+                pass
+
+    def _close_segment(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._current = None
+        self._save_index()
+
+    def _write(self, record):
+        ts = record.get('ts') or time.time()
+        if self._file is None or self._bytes >= self.SEGMENT_MAX_BYTES:
+            self._close_segment()
+            self._open_segment(ts)
+
+        match = _PATH_RE.search(record.get('text', ''))
+        if match:
+            record = dict(record, path=match.group(1))
+        data = (json.dumps(record) + '\n').encode('utf-8')
+        self._file.write(data)
+        self._bytes += len(data)
+
+        with self._index_lock:
+            self._current['end'] = ts
+            self._current['lines'] += 1
+            if match:
+                self._current['paths'].add(match.group(1))
+
+    def _write_error(self, e):
+        # Printing would feed the error back into the archive, write to the real console
+        try:
+            import sys
+            sys.__stdout__.write(f"  Log archive error: {e}\n")
+        except Exception:
+            pass
+
+    def _run(self):
+        """Writer thread: drain the queue, flush and re-index periodically"""
+        last_flush = time.time()
+        while True:
+            try:
+                record = self._queue.get(timeout=self.FLUSH_INTERVAL)
+            except queue.Empty:
+                record = False
+
+            if record is None:
+                break
+            if record:
+                try:
+                    self._write(record)
+                except (OSError, ValueError) as e:
+                    self._write_error(e)
+
+            if self._file and time.time() - last_flush >= self.FLUSH_INTERVAL:
+                try:
+                    # Sync flush makes everything written so far readable by queries
+                    self._file.flush(zlib.Z_SYNC_FLUSH)
+                except OSError as e:
+                    self._write_error(e)
+                self._save_index()
+                last_flush = time.time()
+
+        # Drain whatever was queued before stop()
+        while True:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record:
+                try:
+                    self._write(record)
+                except (OSError, ValueError):
+                    pass
+        self._close_segment()
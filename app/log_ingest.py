@@ -0,0 +1,223 @@
+import re
+import socket
+import threading
+import time
+
+# "2024/01/01 12:00:00 " prefix on MediaMTX lines
+_TIMESTAMP_RE = re.compile(r'^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2} ')
+# "[rtsp @ 0x55d0c8a4e2c0]" context prefixes on FFmpeg lines
+_ADDRESS_RE = re.compile(r'0x[0-9a-fA-F]+')
+
+
+def is_progress_line(line):
+    """FFmpeg -stats progress lines contain "frame=" and "fps=" """
+    return 'frame=' in line and 'fps=' in line
+
+
+def parse_progress_block(fields):
+    """Numbers from one FFmpeg -progress block (fps, speed, dup, drop, bitrate kbps, ...)"""
+    progress = {}
+    for key, name in (('frame', 'frame'), ('fps', 'fps'), ('dup_frames', 'dup'), ('drop_frames', 'drop')):
+        try:
+            progress[name] = float(fields[key])
+        except (KeyError, ValueError):
+            pass
+    try:
+        progress['speed'] = float(fields.get('speed', '').strip().rstrip('x'))
+    except ValueError:
+        pass
+    try:
+        progress['bitrate'] = float(fields.get('bitrate', '').strip().replace('kbits/s', ''))
+    except ValueError:
+        pass
+    if 'out_time' in fields:
+        progress['time'] = fields['out_time']
+    return progress
+
+
+class ProgressListener:
+    """
+    Collects FFmpeg '-progress' reports per process.
+
+    Each FFmpeg spawned by MediaMTX gets '-progress http://127.0.0.1:<port>/<path>'
+    (see url()); FFmpeg then streams key=value blocks as a chunked POST, and the
+    request path says which MediaMTX path the process publishes. A sample is kept
+    while the process is connected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}      # path -> (progress dict, time, connection)
+        self._sock = None
+
+    def start(self):
+        """Listen on a local port; returns False if that is not possible"""
+        if self._sock:
+            return True
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind(('127.0.0.1', 0))
+            sock.listen(64)
+        except OSError as e:
+            sock.close()
+            print(f"  FFmpeg progress listener unavailable: {e}")
+            return False
+        self._sock = sock
+        threading.Thread(target=self._accept_loop, daemon=True, name='ffmpeg-progress').start()
+        return True
+
+    def url(self, path):
+        """-progress URL for the process publishing path (None if not listening)"""
+        if not self._sock:
+            return None
+        return f'http://127.0.0.1:{self._sock.getsockname()[1]}/{path}'
+
+    def get_progress(self):
+        """{path: (progress dict, time of the sample)}"""
+        with self._lock:
+            return {path: (dict(progress), sample_time) for path, (progress, sample_time, _) in self._samples.items()}
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._read, args=(conn,), daemon=True, name='ffmpeg-progress-conn').start()
+
+    def _read(self, conn):
+        # FFmpeg blocks on a full socket buffer, so the connection is always drained
+        path = None
+        fields = {}
+        try:
+            with conn, conn.makefile('rb') as stream:
+                request = stream.readline().decode(errors='replace').split()
+                if len(request) < 2:
+                    return
+                path = request[1].lstrip('/')
+                for raw in stream:
+                    line = raw.decode(errors='replace').strip()
+                    # Headers and chunk sizes have no '=' (and are skipped with it)
+                    key, sep, value = line.partition('=')
+                    if not sep:
+                        continue
+                    fields[key] = value
+                    if key == 'progress':
+                        with self._lock:
+                            self._samples[path] = (parse_progress_block(fields), time.time(), conn)
+                        fields = {}
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                # A restarted process may already be reporting on the same path
+                if path in self._samples and self._samples[path][2] is conn:
+                    del self._samples[path]
+
+
+class OutputIngester:
+    """
+    Ingestion stage for MediaMTX/FFmpeg output before it reaches the Logger.
+
+    - FFmpeg -stats progress lines are kept off the console (per-process numbers
+      come from ProgressListener).
+    - Repeated lines (same text once timestamps/addresses are ignored) are printed
+      once per window, then summarized as "(x57 in last 60s)".
+    - A token bucket bounds how many lines per second reach the console/Logger;
+      the excess is counted and reported.
+
+    flush() reports expired repeat windows and dropped lines without waiting
+    for the next line; call it periodically.
+    """
+
+    REPEAT_WINDOW = 60          # Seconds a repeated line stays collapsed
+    RATE_LIMIT = 50             # Sustained lines per second forwarded
+    RATE_BURST = 200            # Burst allowance
+    MAX_TRACKED = 1000          # Distinct repeated lines remembered
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._repeats = {}      # normalized line -> [first_seen, suppressed_count, last_line]
+        self._tokens = float(self.RATE_BURST)
+        self._last_refill = time.time()
+        self._rate_dropped = 0
+        self._last_sweep = 0
+        self.stats = {'lines': 0, 'progress_lines': 0, 'duplicates': 0, 'rate_limited': 0}
+
+    def feed(self, line, verbose=False):
+        """
+        Process one raw output line and return the lines that should be printed.
+
+        verbose (debug mode) also passes progress lines through as text.
+        """
+        line = line.rstrip('\r\n')
+        if not line.strip():
+            return []
+        now = time.time()
+        out = []
+        with self._lock:
+            self.stats['lines'] += 1
+
+            if is_progress_line(line):
+                self.stats['progress_lines'] += 1
+                if not verbose:
+                    return out
+
+            # Summaries for repeats whose window has ended
+            if now - self._last_sweep >= 1:
+                self._last_sweep = now
+                out.extend(self._sweep(now))
+
+            key = _ADDRESS_RE.sub('', _TIMESTAMP_RE.sub('', line))
+            entry = self._repeats.get(key)
+            if entry and now - entry[0] < self.REPEAT_WINDOW:
+                entry[1] += 1
+                entry[2] = line
+                self.stats['duplicates'] += 1
+                return out
+            if len(self._repeats) >= self.MAX_TRACKED:
+                out.extend(self._sweep(now, force=True))
+            self._repeats[key] = [now, 0, line]
+
+            if self._take_token(now):
+                if self._rate_dropped:
+                    out.append(f"  [log] {self._rate_dropped} output lines dropped (rate limit)")
+                    self._rate_dropped = 0
+                out.append(line)
+            else:
+                self._rate_dropped += 1
+                self.stats['rate_limited'] += 1
+        return out
+
+    def flush(self):
+        """Return the summaries that are due (for output that has gone quiet)"""
+        now = time.time()
+        with self._lock:
+            self._last_sweep = now
+            out = self._sweep(now)
+            if self._rate_dropped:
+                out.append(f"  [log] {self._rate_dropped} output lines dropped (rate limit)")
+                self._rate_dropped = 0
+        return out
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+    def _take_token(self, now):
+        self._tokens = min(self.RATE_BURST, self._tokens + (now - self._last_refill) * self.RATE_LIMIT)
+        self._last_refill = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _sweep(self, now, force=False):
+        """Emit summaries for expired repeat windows and forget them"""
+        out = []
+        for key, (first_seen, count, last_line) in list(self._repeats.items()):
+            if force or now - first_seen >= self.REPEAT_WINDOW:
+                del self._repeats[key]
+                if count:
+                    out.append(f"{last_line}  (x{count} in last {int(now - first_seen)}s)")
+        return out
@@ -57,10 +57,8 @@ def main():
     auto_start_cameras = [cam for cam in manager.cameras if cam.auto_start]
     if auto_start_cameras:
         print(f"\nAuto-starting {len(auto_start_cameras)} camera(s)...")
-        for camera in auto_start_cameras:
-            camera.start()
-            print(f"  Started: {camera.name}")
-            print("-" * 40)
+        # MediaMTX is started below with the complete config, so no apply here
+        manager.start_cameras(auto_start_cameras, apply_config=False)
         print("\n" + "=" * 60)
     else:
         print("\n  No cameras configured for auto-start")
@@ -127,6 +125,11 @@ def main():
             
     except KeyboardInterrupt:
         print("\n\nShutdown requested...")
+        manager.flush_config()
+        manager.snapshots.stop_all()
+        if manager.onvif_server:
+            manager.onvif_server.stop()
         manager.mediamtx.stop()
+        manager.log_archive.stop()
         print("Server stopped successfully. Goodbye!")
         sys.exit(0)
@@ -1,35 +1,63 @@
-import json
-import os
+import copy
 import time
 import sys
 import threading
-import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import secrets
 import string
-from pathlib import Path
 from urllib.parse import quote
 from werkzeug.security import generate_password_hash, check_password_hash
 import ipaddress
-from .config import CONFIG_FILE, MEDIAMTX_PORT, MEDIAMTX_API_PORT
+from .config import CONFIG_FILE, MEDIAMTX_PORT, MEDIAMTX_API_PORT, LOG_DIR
 from .camera import VirtualONVIFCamera
 from .onvif_service import ONVIFService
 from .mediamtx_manager import MediaMTXManager
 from .linux_service import LinuxServiceManager
 from .analytics import AnalyticsManager
+from .onvif_server import SharedONVIFServer
+from .discovery import WSDiscoveryResponder
+from .snapshots import SnapshotManager
+from .metrics import MetricsCollector
+from .events import EventBroadcaster
+from .log_archive import LogArchive
+from .config_store import ConfigStore
+from .camera_registry import CameraRegistry
+from .utils import add_log_listener
 import requests
 
 class CameraManager:
     """Manages multiple virtual ONVIF cameras"""
     
+    # Stream watchdog tuning
+    WATCHDOG_STALE_SECONDS = 120        # Zero-bitrate time before a path is recovered
+    WATCHDOG_BACKOFF_BASE = 30          # First retry delay after a recovery attempt
+    WATCHDOG_BACKOFF_MAX = 900          # Upper bound for the exponential backoff
+    WATCHDOG_BREAKER_ATTEMPTS = 5       # Failed recoveries before the circuit opens
+    WATCHDOG_BREAKER_COOLDOWN = 3600    # How long an open circuit suppresses recovery
+    
+    STARTUP_CONCURRENCY = 8             # Cameras brought up in parallel (vNIC setup waits on DHCP)
+    
     def __init__(self, config_file=CONFIG_FILE):
         self.config_file = config_file
-        self.cameras = []
+        self.config_store = ConfigStore(config_file)
+        # Reentrant: camera add/update/delete hold it while calling save_config()
+        self._lock = threading.RLock()
+        self.cameras = CameraRegistry(self._lock)
         self.next_id = 1
         self.next_onvif_port = 8001
         self.mediamtx = MediaMTXManager()
         self.service_mgr = LinuxServiceManager()
         self.analytics = AnalyticsManager()
-        self._lock = threading.Lock()
+        self.discovery = WSDiscoveryResponder()
+        self.snapshots = SnapshotManager(self)
+        self.metrics = MetricsCollector()
+        self.events = EventBroadcaster(self)
+        add_log_listener(lambda message: self.events.publish('log', message))
+        
+        # Persistent log archive of everything that reaches the Logger
+        self.log_archive = LogArchive(LOG_DIR)
+        self.log_archive.start()
+        add_log_listener(self.log_archive.append)
         
         # Start analytics polling
         self.analytics.start()
@@ -44,6 +72,8 @@ class CameraManager:
 
         # Stream Watchdog tracking
         self.stale_path_times = {} # path_name -> first_stale_timestamp
+        self.path_recovery = {} # path_name -> {'attempts', 'next_attempt', 'open_until'}
+        self.watchdog_stats = {'path_recoveries': 0, 'recovery_failures': 0, 'circuit_trips': 0, 'full_restarts': 0}
         self._watchdog_running = False
         self._watchdog_thread = None
 
@@ -69,34 +99,55 @@ class CameraManager:
                 'globalArgs': '-hide_banner -loglevel error',
                 'inputArgs': '-rtsp_transport tcp -reconnect 1 -reconnect_at_eof 1 -reconnect_streamed 1 -reconnect_delay_max 2',
                 'processArgs': '-c:v libx264 -preset ultrafast -tune zerolatency -g 30',
+            },
+            'onvif': {
+                'sharedServer': False,
+                'workerThreads': 32,
+            },
+            'startup': {
+                'concurrency': self.STARTUP_CONCURRENCY,
+            },
+            'gridFusion': {
+                'sharedDecode': True,
+                'backend': 'ffmpeg',
+                'controlPort': 5590,
             }
         }
         
+        # Progress of the last start_cameras() run
+        self.startup_progress = {'running': False, 'total': 0, 'started': 0, 'failed': 0, 'cameras': {}}
+        
         self.ip_whitelist = []
         self.load_config()
         
+        # Optional single event-driven ONVIF server for all cameras (applied at startup)
+        self.onvif_server = None
+        onvif_settings = self.advanced_settings.get('onvif', {})
+        if onvif_settings.get('sharedServer', False):
+            self.onvif_server = SharedONVIFServer(max_workers=int(onvif_settings.get('workerThreads', 32)))
+        
         # Start watchdog
         self.start_watchdog()
         
     def load_config(self):
         """Load camera configuration"""
-        if Path(self.config_file).exists():
-            with open(self.config_file, 'r') as f:
-                config = json.load(f)
-            
-            # Clear existing cameras before loading to prevent duplicates
-            self.cameras.clear()
-            self.next_id = 1
-            self.next_onvif_port = 8001
-                
-            for cam_config in config.get('cameras', []):
-                camera = VirtualONVIFCamera(cam_config, self)
-                self.cameras.append(camera)
-                
-                if cam_config['id'] >= self.next_id:
-                    self.next_id = cam_config['id'] + 1
-                if cam_config.get('onvifPort', 0) >= self.next_onvif_port:
-                    self.next_onvif_port = cam_config['onvifPort'] + 1
+        # Deep copy: camera/layout objects built from it are mutated later
+        config = copy.deepcopy(self.config_store.get())
+        if config is not None:
+            with self._lock:
+                # Clear existing cameras before loading to prevent duplicates
+                self.cameras.clear()
+                self.next_id = 1
+                self.next_onvif_port = 8001
+                    
+                for cam_config in config.get('cameras', []):
+                    camera = VirtualONVIFCamera(cam_config, self)
+                    self.cameras.add(camera)
+                    
+                    if cam_config['id'] >= self.next_id:
+                        self.next_id = cam_config['id'] + 1
+                    if cam_config.get('onvifPort', 0) >= self.next_onvif_port:
+                        self.next_onvif_port = cam_config['onvifPort'] + 1
             
             # Load settings
             self.server_ip = config.get('settings', {}).get('serverIp', 'localhost')
@@ -254,45 +305,41 @@ class CameraManager:
         
         with self._lock:
             try:
-                # Use a temporary file for atomic write
-                fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.config_file)), text=True)
-                with os.fdopen(fd, 'w') as f:
-                    json.dump(config, f, indent=2)
-                
-                # Atomic rename
-                os.replace(temp_path, self.config_file)
+                self.config_store.write(config)
             except Exception as e:
                 print(f"Error saving config: {e}")
-                if 'temp_path' in locals() and os.path.exists(temp_path):
-                    os.remove(temp_path)
+
+    def flush_config(self):
+        """Write any pending (debounced) config changes to disk now"""
+        self.config_store.flush()
 
     def load_settings(self):
         """Load settings from config with error safety"""
         try:
-            if not os.path.exists(self.config_file):
+            config = self.config_store.get()
+            if config is None:
                 return {}
             
-            with open(self.config_file, 'r') as f:
-                config = json.load(f)
-                settings = config.get('settings', {})
-                
-                # Update attributes from settings
-                self.server_ip = settings.get('serverIp', 'localhost')
-                self.open_browser = settings.get('openBrowser', True)
-                self.theme = settings.get('theme', 'dracula')
-                self.grid_columns = settings.get('gridColumns', 3)
-                self.rtsp_port = settings.get('rtspPort', 8554)
-                self.auto_boot = settings.get('autoBoot', False)
-                self.global_username = settings.get('globalUsername', 'admin')
-                self.global_password = settings.get('globalPassword', 'admin')
-                self.rtsp_auth_enabled = settings.get('rtspAuthEnabled', False)
-                self.debug_mode = settings.get('debugMode', False)
-                
-                # Ensure whitelist exists
-                self.ip_whitelist = settings.get('ipWhitelist', [])
-                settings['ipWhitelist'] = self.ip_whitelist
-                
-                return settings
+            # Copy: the cached config is shared
+            settings = dict(config.get('settings', {}))
+            
+            # Update attributes from settings
+            self.server_ip = settings.get('serverIp', 'localhost')
+            self.open_browser = settings.get('openBrowser', True)
+            self.theme = settings.get('theme', 'dracula')
+            self.grid_columns = settings.get('gridColumns', 3)
+            self.rtsp_port = settings.get('rtspPort', 8554)
+            self.auto_boot = settings.get('autoBoot', False)
+            self.global_username = settings.get('globalUsername', 'admin')
+            self.global_password = settings.get('globalPassword', 'admin')
+            self.rtsp_auth_enabled = settings.get('rtspAuthEnabled', False)
+            self.debug_mode = settings.get('debugMode', False)
+            
+            # Ensure whitelist exists
+            self.ip_whitelist = list(settings.get('ipWhitelist', []))
+            settings['ipWhitelist'] = self.ip_whitelist
+            
+            return settings
         except Exception as e:
             print(f"Error loading settings: {e}")
             return {}
@@ -347,11 +394,9 @@ class CameraManager:
         self.save_config()
 
         if restart_needed:
-            print("Settings changed, restarting MediaMTX...")
-            rtsp_user = self.global_username if self.rtsp_auth_enabled else ''
-            rtsp_pass = self.global_password if self.rtsp_auth_enabled else ''
-            self.mediamtx.restart(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), 
-                                  debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+            # Global changes (port, debug, advanced) restart MediaMTX, credential changes only reload paths
+            print("Settings changed, applying MediaMTX configuration...")
+            self.apply_mediamtx_config()
         
         return self.load_settings()
 
@@ -509,22 +554,24 @@ class CameraManager:
         # For simplicity, we compare the JSON representation of relevant fields
         
         def extract_stream_config(layouts):
-            return [{k: v for k, v in l.items() if k in ['id', 'enabled', 'resolution', 'cameras', 'outputFramerate']} for l in layouts]
+            return [{k: v for k, v in l.items() if k in ['id', 'enabled', 'resolution', 'cameras', 'outputFramerate', 'compositor']} for l in layouts]
             
         if extract_stream_config(old_layouts) != extract_stream_config(self.grid_fusion_layouts):
-            print("GridFusion layouts changed, restarting MediaMTX...")
-            rtsp_user = self.global_username if self.rtsp_auth_enabled else ''
-            rtsp_pass = self.global_password if self.rtsp_auth_enabled else ''
-            self.mediamtx.restart(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+            print("GridFusion layouts changed, reloading MediaMTX paths...")
+            self.apply_mediamtx_config()
 
         return self.get_grid_fusion()
     
+    def apply_mediamtx_config(self):
+        """Push the current cameras and GridFusion layouts to MediaMTX (hot-reloads paths when possible)"""
+        rtsp_user = self.global_username if getattr(self, 'rtsp_auth_enabled', False) else ''
+        rtsp_pass = self.global_password if getattr(self, 'rtsp_auth_enabled', False) else ''
+        return self.mediamtx.apply_config(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+    
     def is_port_available(self, port, exclude_camera_id=None):
         """Check if an ONVIF port is available (not used by other cameras)"""
-        for camera in self.cameras:
-            if camera.id != exclude_camera_id and camera.onvif_port == port:
-                return False
-        return True
+        camera = self.cameras.get_by_port(port)
+        return camera is None or camera.id == exclude_camera_id
     
     def add_camera(self, name, host, rtsp_port, username, password, main_path, sub_path, auto_start=False,
                    main_width=1920, main_height=1080, sub_width=640, sub_height=480,
@@ -602,15 +649,16 @@ class CameraManager:
             'debugMode': getattr(self, 'debug_mode', False)
         }
         
-        camera = VirtualONVIFCamera(config, self)
-        self.cameras.append(camera)
-        
-        self.next_id += 1
-        # Update next_onvif_port to be higher than any used port
-        if onvif_port >= self.next_onvif_port:
-            self.next_onvif_port = onvif_port + 1
-        
-        self.save_config()
+        with self._lock:
+            camera = VirtualONVIFCamera(config, self)
+            self.cameras.add(camera)
+            
+            self.next_id += 1
+            # Update next_onvif_port to be higher than any used port
+            if onvif_port >= self.next_onvif_port:
+                self.next_onvif_port = onvif_port + 1
+            
+            self.save_config()
         return camera
     
     def update_camera(self, camera_id, name, host, rtsp_port, username, password, main_path, sub_path, auto_start=False,
@@ -667,7 +715,8 @@ class CameraManager:
         path_name = name.lower().replace(' ', '_').replace('-', '_')
         path_name = ''.join(c for c in path_name if c.isalnum() or c == '_')
         
-        # Update camera properties
+        # Update camera properties (the registry is keyed by the port it was indexed under)
+        old_port = camera.onvif_port
         camera.name = name
         camera.main_stream_url = main_url
         camera.sub_stream_url = sub_url
@@ -697,6 +746,12 @@ class CameraManager:
         if uuid:
             camera.uuid = uuid
         
+        # ONVIF port may have changed
+        self.cameras.reindex(camera, old_port)
+        
+        # Invalidate cached ONVIF responses rendered from the old config
+        camera.config_version += 1
+        
         print(f"\nUpdated camera: {name}")
         
         # Save config
@@ -705,9 +760,7 @@ class CameraManager:
         # Restart camera if it was running
         if was_running:
             camera.start()
-            rtsp_user = self.global_username if self.rtsp_auth_enabled else ''
-            rtsp_pass = self.global_password if self.rtsp_auth_enabled else ''
-            self.mediamtx.restart(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+            self.apply_mediamtx_config()
         
         return camera
     
@@ -716,37 +769,84 @@ class CameraManager:
         camera = self.get_camera(camera_id)
         if camera:
             camera.stop()
-            self.cameras = [c for c in self.cameras if c.id != camera_id]
-            self.save_config()
-            rtsp_user = self.global_username if self.rtsp_auth_enabled else ''
-            rtsp_pass = self.global_password if self.rtsp_auth_enabled else ''
-            self.mediamtx.restart(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+            with self._lock:
+                self.cameras.remove(camera)
+                self.save_config()
+            self.apply_mediamtx_config()
             return True
         return False
     
     def get_camera(self, camera_id):
         """Get camera by ID"""
-        for camera in self.cameras:
-            if camera.id == camera_id:
-                return camera
-        return None
+        return self.cameras.get(camera_id)
     
 
     def start_all(self):
         """Start all cameras"""
-        for camera in self.cameras:
+        self.start_cameras(list(self.cameras))
+    
+    def start_cameras(self, cameras, apply_config=True):
+        """
+        Start cameras in parallel on a bounded worker pool, then apply the MediaMTX
+        config once for all of them (skipped with apply_config=False, e.g. at boot
+        before MediaMTX itself is started). Returns the cameras that started.
+        """
+        cameras = list(cameras)
+        if not cameras:
+            return []
+        try:
+            concurrency = int(self.advanced_settings.get('startup', {}).get('concurrency', self.STARTUP_CONCURRENCY))
+        except (TypeError, ValueError):
+            concurrency = self.STARTUP_CONCURRENCY
+        concurrency = max(1, min(concurrency, len(cameras)))
+        
+        progress = {
+            'running': True, 'total': len(cameras), 'started': 0, 'failed': 0,
+            'cameras': {cam.id: 'pending' for cam in cameras},
+        }
+        self.startup_progress = progress
+        self.events.publish('startup', progress)
+        
+        def start_one(camera):
+            progress['cameras'][camera.id] = 'starting'
+            begin = time.time()
             camera.start()
-        rtsp_user = self.global_username if self.rtsp_auth_enabled else ''
-        rtsp_pass = self.global_password if self.rtsp_auth_enabled else ''
-        self.mediamtx.restart(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+            return time.time() - begin
+        
+        started = []
+        begin = time.time()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='camera-start') as pool:
+            futures = {pool.submit(start_one, camera): camera for camera in cameras}
+            for future in as_completed(futures):
+                camera = futures[future]
+                done = progress['started'] + progress['failed'] + 1
+                try:
+                    elapsed = future.result()
+                    progress['started'] += 1
+                    progress['cameras'][camera.id] = 'started'
+                    started.append(camera)
+                    print(f"  [{done}/{len(cameras)}] Started: {camera.name} ({elapsed:.1f}s)")
+                except Exception as e:
+                    progress['failed'] += 1
+                    progress['cameras'][camera.id] = 'failed'
+                    camera.status = "stopped"
+                    print(f"  [{done}/{len(cameras)}] Failed to start {camera.name}: {e}")
+                self.events.publish('startup', progress)
+        
+        progress['running'] = False
+        print(f"  Started {progress['started']}/{len(cameras)} camera(s) in {time.time() - begin:.1f}s "
+              f"({concurrency} in parallel)")
+        
+        if apply_config:
+            self.apply_mediamtx_config()
+        self.events.publish('startup', progress)
+        return started
     
     def stop_all(self):
         """Stop all cameras"""
         for camera in self.cameras:
             camera.stop()
-        rtsp_user = self.global_username if self.rtsp_auth_enabled else ''
-        rtsp_pass = self.global_password if self.rtsp_auth_enabled else ''
-        self.mediamtx.restart(self.cameras, self.rtsp_port, rtsp_user, rtsp_pass, self.get_grid_fusion(), debug_mode=self.debug_mode, advanced_settings=self.advanced_settings)
+        self.apply_mediamtx_config()
 
     # --- Authentication Methods ---
     
@@ -756,12 +856,9 @@ class CameraManager:
         if hasattr(self, 'setup_shown'):
             return False
             
-        settings_file = Path(self.config_file)
-        if settings_file.exists():
-            with open(settings_file, 'r') as f:
-                config = json.load(f)
-                if 'auth' in config:
-                    return False
+        config = self.config_store.get()
+        if config is not None and 'auth' in config:
+            return False
         return True
 
     def skip_setup(self):
@@ -819,34 +916,50 @@ class CameraManager:
             time.sleep(15) # Check every 15 seconds
 
     def _check_stream_health(self):
-        """Check for hung streams and perform recovery"""
+        """Check for hung streams and recover only the affected paths"""
         analytics = self.analytics.get_analytics()
         now = time.time()
         restart_needed = False
         stale_paths = []
+        recovered_hosts = {}    # Host path -> result, so layouts sharing a process recycle it once
 
         for path_name, stats in analytics.items():
             # We care about publishers that are 'ready' but sending 0 bytes
             is_publisher = stats.get('source') == 'publisher'
             is_ready = stats.get('ready', False)
             is_stale = stats.get('stale', False)
+            # Recovery (and its backoff) works on the path running the publisher, which for
+            # GridFusion layouts on a shared-decode process is that process's path
+            host = self.mediamtx.get_composite_host(path_name)
             
-            if is_ready and is_stale and is_publisher:
+            # A path we already tried to recover that has not come back is still unhealthy
+            # (a path without a source reports no 'publisher' source, so only readiness counts)
+            is_failing = not is_ready and host in self.path_recovery
+            
+            if (is_ready and is_stale and is_publisher) or is_failing:
                 if path_name not in self.stale_path_times:
                     self.stale_path_times[path_name] = now
                 
                 stale_duration = now - self.stale_path_times[path_name]
-                if stale_duration > 120: # 2 minutes of zero-bitrate "zombie" state
-                    print(f"Watchdog Alert: Path '{path_name}' has been dead for {stale_duration:.0f}s. Recovery needed.")
-                    restart_needed = True
-                    stale_paths.append(path_name)
+                if stale_duration > self.WATCHDOG_STALE_SECONDS:
+                    if host not in recovered_hosts:
+                        recovered_hosts[host] = self._recover_path(host, stale_duration, now)
+                    if not recovered_hosts[host]:
+                        restart_needed = True
+                        stale_paths.append(path_name)
             else:
                 # Path is healthy or not active, clear stale marker
                 if path_name in self.stale_path_times:
                     del self.stale_path_times[path_name]
+                # Only a path that is actually flowing again resets its backoff
+                if is_ready and not is_stale and host in self.path_recovery:
+                    print(f"Watchdog: Path '{host}' recovered.")
+                    del self.path_recovery[host]
 
         if restart_needed:
+            # Only reached when the MediaMTX API could not re-create the paths
             print(f"Watchdog: Restarting MediaMTX to recover {len(stale_paths)} stalled streams...")
+            self.watchdog_stats['full_restarts'] += 1
             rtsp_user = self.global_username if getattr(self, 'rtsp_auth_enabled', False) else ''
             rtsp_pass = self.global_password if getattr(self, 'rtsp_auth_enabled', False) else ''
             self.mediamtx.restart(
@@ -861,3 +974,38 @@ class CameraManager:
             # Clear all stale trackers after restart to give them time to come back
             self.stale_path_times.clear()
             time.sleep(30) # Grace period after restart
+
+    def _recover_path(self, path_name, stale_duration, now):
+        """
+        Recover a single stalled path with exponential backoff and a circuit breaker.
+        Returns False only if the path could not be re-created through the API.
+        """
+        state = self.path_recovery.setdefault(path_name, {'attempts': 0, 'next_attempt': 0, 'open_until': 0})
+        
+        if now < state['open_until'] or now < state['next_attempt']:
+            return True
+        
+        if state['attempts'] >= self.WATCHDOG_BREAKER_ATTEMPTS:
+            # Camera looks permanently offline - stop hammering it for a while
+            state['open_until'] = now + self.WATCHDOG_BREAKER_COOLDOWN
+            state['attempts'] = 0
+            self.watchdog_stats['circuit_trips'] += 1
+            print(f"Watchdog: Path '{path_name}' still down after {self.WATCHDOG_BREAKER_ATTEMPTS} recoveries. "
+                  f"Pausing recovery for {self.WATCHDOG_BREAKER_COOLDOWN // 60} minutes.")
+            return True
+        
+        print(f"Watchdog Alert: Path '{path_name}' has been dead for {stale_duration:.0f}s. Recovering path...")
+        state['attempts'] += 1
+        delay = min(self.WATCHDOG_BACKOFF_BASE * (2 ** (state['attempts'] - 1)), self.WATCHDOG_BACKOFF_MAX)
+        state['next_attempt'] = now + delay
+        
+        if not self.mediamtx.recycle_path(path_name):
+            self.watchdog_stats['recovery_failures'] += 1
+            return False
+        
+        self.watchdog_stats['path_recoveries'] += 1
+        # Restart the stale clock of every path it publishes so they get a fair chance to come back
+        for name in self.stale_path_times:
+            if self.mediamtx.get_composite_host(name) == path_name:
+                self.stale_path_times[name] = now
+        return True
@@ -0,0 +1,216 @@
+import threading
+import psutil
+
+# Latency buckets in seconds (Prometheus histogram "le" bounds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative latency histogram for one label set"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsCollector:
+    """
+    In-process request metrics (ONVIF requests, MediaMTX auth hook).
+
+    Stream and process metrics are not collected here; they are read from the
+    existing AnalyticsManager / MediaMTXManager state when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels tuple) -> Histogram
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Copy of all histograms: {name: [(labels dict, counts, sum, count)]}"""
+        result = {}
+        with self._lock:
+            for (name, labels), histogram in self._histograms.items():
+                result.setdefault(name, []).append(
+                    (dict(labels), list(histogram.counts), histogram.total, histogram.count))
+        return result
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class _Writer:
+    """Accumulates Prometheus text exposition lines"""
+
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, metric_type, help_text):
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {metric_type}')
+
+    def sample(self, name, value, **labels):
+        # Integers verbatim (byte counters must not lose precision), floats via repr
+        text = str(value) if isinstance(value, int) else repr(float(value))
+        self.lines.append(f'{name}{_labels(labels)} {text}')
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def _ffmpeg_children(mediamtx):
+    """FFmpeg processes spawned by MediaMTX: [(path, pid, cpu_seconds, rss_bytes)]"""
+    process = getattr(mediamtx, 'process', None)
+    if not process or process.poll() is not None:
+        return []
+    children = []
+    try:
+        parent = psutil.Process(process.pid)
+        for child in parent.children(recursive=True):
+            try:
+                if 'ffmpeg' not in child.name().lower():
+                    continue
+                # The -progress URL names the path the process reports under; without one,
+                # the output RTSP URL (last one on the command line) names the published path
+                cmdline = child.cmdline()
+                path = ''
+                if '-progress' in cmdline[:-1]:
+                    path = cmdline[cmdline.index('-progress') + 1].rsplit('/', 1)[-1]
+                for arg in reversed(cmdline if not path else []):
+                    if arg.startswith('rtsp://'):
+                        path = arg.rsplit('/', 1)[-1]
+                        break
+                cpu = child.cpu_times()
+                children.append((path, child.pid, cpu.user + cpu.system, child.memory_info().rss))
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    return children
+
+
+def render_metrics(manager):
+    """Render all metrics in the Prometheus text format"""
+    out = _Writer()
+
+    # Cameras
+    out.family('onvif_camera_up', 'gauge', 'Virtual camera running (1) or stopped (0)')
+    for camera in list(manager.cameras):
+        out.sample('onvif_camera_up', 1 if camera.status == "running" else 0,
+                   camera=camera.name, path=camera.path_name)
+
+    # Stream paths (latest AnalyticsManager poll, no extra MediaMTX requests)
+    analytics = manager.analytics.get_analytics()
+    path_metrics = (
+        ('mediamtx_path_bitrate_kbps', 'gauge', 'Incoming bitrate', lambda a: a.get('bitrate', 0)),
+        ('mediamtx_path_bytes_received_total', 'counter', 'Bytes received by the path', lambda a: a.get('bytesReceived', 0)),
+        ('mediamtx_path_bytes_sent_total', 'counter', 'Bytes sent to readers', lambda a: a.get('bytesSent', 0)),
+        ('mediamtx_path_readers', 'gauge', 'Connected readers', lambda a: a.get('readers', 0)),
+        ('mediamtx_path_ready', 'gauge', 'Path has an active source', lambda a: 1 if a.get('ready') else 0),
+        ('mediamtx_path_stale', 'gauge', 'No bytes received for 10 seconds', lambda a: 1 if a.get('stale') else 0),
+    )
+    for name, metric_type, help_text, getter in path_metrics:
+        out.family(name, metric_type, help_text)
+        for path_name, data in sorted(analytics.items()):
+            out.sample(name, getter(data), path=path_name)
+    out.family('mediamtx_analytics_last_poll_timestamp_seconds', 'gauge', 'Time of the last analytics poll')
+    out.sample('mediamtx_analytics_last_poll_timestamp_seconds', manager.analytics.last_poll_time)
+
+    # Watchdog
+    watchdog_stats = dict(getattr(manager, 'watchdog_stats', {}))
+    for key, help_text in (
+        ('path_recoveries', 'Stalled paths recycled by the watchdog'),
+        ('recovery_failures', 'Path recoveries that failed'),
+        ('circuit_trips', 'Paths whose recovery circuit breaker opened'),
+        ('full_restarts', 'Full MediaMTX restarts triggered by the watchdog'),
+    ):
+        name = f'watchdog_{key}_total'
+        out.family(name, 'counter', help_text)
+        out.sample(name, watchdog_stats.get(key, 0))
+    out.family('watchdog_stale_paths', 'gauge', 'Paths currently without incoming data')
+    out.sample('watchdog_stale_paths', len(getattr(manager, 'stale_path_times', {})))
+
+    # MediaMTX process
+    mediamtx = manager.mediamtx
+    out.family('mediamtx_up', 'gauge', 'MediaMTX process alive')
+    out.sample('mediamtx_up', 1 if mediamtx.is_running() else 0)
+    out.family('mediamtx_restarts_total', 'counter', 'MediaMTX process restarts')
+    out.sample('mediamtx_restarts_total', getattr(mediamtx, 'restart_count', 0))
+
+    # FFmpeg children
+    # Summed per path: a pid label would start a new series on every restart
+    per_path = {}
+    for path, _, cpu_seconds, rss in _ffmpeg_children(mediamtx):
+        totals = per_path.setdefault(path, [0, 0])
+        totals[0] += cpu_seconds
+        totals[1] += rss
+    out.family('ffmpeg_process_cpu_seconds_total', 'counter', 'CPU time used by the FFmpeg children of MediaMTX')
+    for path, (cpu_seconds, _) in sorted(per_path.items()):
+        out.sample('ffmpeg_process_cpu_seconds_total', cpu_seconds, path=path)
+    out.family('ffmpeg_process_resident_memory_bytes', 'gauge', 'Resident memory of the FFmpeg children of MediaMTX')
+    for path, (_, rss) in sorted(per_path.items()):
+        out.sample('ffmpeg_process_resident_memory_bytes', rss, path=path)
+
+    # Output ingestion (MediaMTX/FFmpeg console output)
+    ingester = getattr(mediamtx, 'output_ingester', None)
+    if ingester:
+        ingest_stats = ingester.get_stats()
+        out.family('mediamtx_output_lines_total', 'counter', 'Output lines read from MediaMTX and its FFmpeg children')
+        out.sample('mediamtx_output_lines_total', ingest_stats['lines'])
+        out.family('mediamtx_output_lines_suppressed_total', 'counter', 'Output lines kept off the console')
+        for reason in ('progress_lines', 'duplicates', 'rate_limited'):
+            out.sample('mediamtx_output_lines_suppressed_total', ingest_stats[reason], reason=reason)
+
+    # Per-process FFmpeg progress, labelled with the path the process publishes
+    listener = getattr(mediamtx, 'progress_listener', None)
+    if listener:
+        progress = sorted(listener.get_progress().items())
+        for key, help_text in (('fps', 'Frames per second'), ('speed', 'Encoding speed relative to realtime'),
+                               ('dup', 'Duplicated frames'), ('drop', 'Dropped frames')):
+            name = f'ffmpeg_progress_{key}'
+            out.family(name, 'gauge', f'{help_text} reported by the FFmpeg process')
+            for path, (sample, _) in progress:
+                if key in sample:
+                    out.sample(name, sample[key], path=path)
+
+    # Request histograms
+    collector = getattr(manager, 'metrics', None)
+    histograms = collector.snapshot() if collector else {}
+    for name, help_text in (
+        ('onvif_request_duration_seconds', 'ONVIF request handling time'),
+        ('mediamtx_auth_hook_duration_seconds', 'MediaMTX authentication hook handling time'),
+    ):
+        out.family(name, 'histogram', help_text)
+        for labels, counts, total, count in histograms.get(name, []):
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                out.sample(f'{name}_bucket', bucket_count, **labels, le=f'{bound:g}')
+            out.sample(f'{name}_bucket', count, **labels, le='+Inf')
+            out.sample(f'{name}_sum', total, **labels)
+            out.sample(f'{name}_count', count, **labels)
+
+    return out.text()
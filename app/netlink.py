@@ -0,0 +1,281 @@
+import ipaddress
+import os
+import select
+import socket
+import struct
+import threading
+import time
+
+# Minimal rtnetlink (NETLINK_ROUTE) client for managing the virtual NICs in-process.
+# Only what LinuxNetworkManager needs: macvlan links, link flags, IPv4 addresses,
+# link listing and address notifications.
+
+NETLINK_ROUTE = 0
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_DELADDR = 21
+RTM_GETADDR = 22
+
+NLM_F_REQUEST = 0x1
+NLM_F_ACK = 0x4
+NLM_F_EXCL = 0x200
+NLM_F_CREATE = 0x400
+NLM_F_DUMP = 0x300
+
+IFLA_ADDRESS = 1
+IFLA_IFNAME = 3
+IFLA_LINK = 5
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+IFLA_INFO_DATA = 2
+IFLA_MACVLAN_MODE = 1
+MACVLAN_MODE_BRIDGE = 4
+
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+
+IFF_UP = 0x1
+IFF_PROMISC = 0x100
+
+RTMGRP_IPV4_IFADDR = 0x10
+
+_NLMSGHDR = struct.Struct('=LHHLL')     # len, type, flags, seq, pid
+_IFINFOMSG = struct.Struct('=BxHiII')   # family, type, index, flags, change
+_IFADDRMSG = struct.Struct('=BBBBi')    # family, prefixlen, flags, scope, index
+_RTATTR = struct.Struct('=HH')          # len, type
+
+
+class NetlinkError(OSError):
+    """A netlink request was rejected by the kernel (errno is set)"""
+
+
+def is_available():
+    """True if this platform has rtnetlink sockets"""
+    return hasattr(socket, 'AF_NETLINK')
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _attr(attr_type, payload):
+    data = _RTATTR.pack(_RTATTR.size + len(payload), attr_type) + payload
+    return data + b'\0' * (_align(len(data)) - len(data))
+
+
+def _parse_attrs(data):
+    attrs = {}
+    offset = 0
+    while offset + _RTATTR.size <= len(data):
+        length, attr_type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attrs[attr_type & 0x3fff] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def _mac_bytes(mac):
+    """'aa:bb:cc:dd:ee:ff' (or '-' separated) to 6 bytes; ValueError if malformed"""
+    value = bytes(int(part, 16) for part in mac.replace('-', ':').split(':'))
+    if len(value) != 6:
+        raise ValueError(f"Invalid MAC address: {mac}")
+    return value
+
+
+class Netlink:
+    """
+    rtnetlink client.
+
+    Every public call opens its own short-lived socket, so instances can be shared
+    between the camera startup workers. Raises PermissionError (EPERM) when the
+    process lacks CAP_NET_ADMIN, NetlinkError for other kernel errors.
+    """
+
+    RECV_SIZE = 65536
+
+    def __init__(self):
+        self._seq = int(time.time()) & 0xffff
+        self._seq_lock = threading.Lock()
+
+    # --- Links ---
+
+    def link_index(self, name):
+        try:
+            return socket.if_nametoindex(name)
+        except OSError:
+            return None
+
+    def list_links(self):
+        """Names of all network interfaces"""
+        names = []
+        for msg_type, payload in self._request(RTM_GETLINK, NLM_F_DUMP, _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0)):
+            if msg_type != RTM_NEWLINK:
+                continue
+            attrs = _parse_attrs(payload[_IFINFOMSG.size:])
+            if IFLA_IFNAME in attrs:
+                names.append(attrs[IFLA_IFNAME].rstrip(b'\0').decode())
+        return names
+
+    def create_macvlan(self, name, parent, mac=None, up=True):
+        """Create a bridge-mode macvlan on parent (with MAC address), optionally brought up"""
+        parent_index = self.link_index(parent)
+        if parent_index is None:
+            raise NetlinkError(19, f"No such device: {parent}")
+        flags = IFF_UP if up else 0
+        body = _IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, flags, flags)
+        body += _attr(IFLA_IFNAME, name.encode() + b'\0')
+        body += _attr(IFLA_LINK, struct.pack('=I', parent_index))
+        if mac:
+            body += _attr(IFLA_ADDRESS, _mac_bytes(mac))
+        info_data = _attr(IFLA_MACVLAN_MODE, struct.pack('=I', MACVLAN_MODE_BRIDGE))
+        body += _attr(IFLA_LINKINFO, _attr(IFLA_INFO_KIND, b'macvlan') + _attr(IFLA_INFO_DATA, info_data))
+        self._request(RTM_NEWLINK, NLM_F_CREATE | NLM_F_EXCL | NLM_F_ACK, body)
+
+    def delete_link(self, name):
+        """Delete an interface; returns False if it did not exist"""
+        index = self.link_index(name)
+        if index is None:
+            return False
+        self._request(RTM_DELLINK, NLM_F_ACK, _IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, 0, 0))
+        return True
+
+    def set_link_flags(self, name, flags, mask):
+        """Set the interface flags in mask to flags (e.g. IFF_PROMISC)"""
+        index = self.link_index(name)
+        if index is None:
+            raise NetlinkError(19, f"No such device: {name}")
+        self._request(RTM_NEWLINK, NLM_F_ACK, _IFINFOMSG.pack(socket.AF_UNSPEC, 0, index, flags, mask))
+
+    # --- Addresses ---
+
+    def add_ipv4(self, name, address, prefixlen=32):
+        index = self.link_index(name)
+        if index is None:
+            raise NetlinkError(19, f"No such device: {name}")
+        packed = socket.inet_aton(address)
+        body = _IFADDRMSG.pack(socket.AF_INET, int(prefixlen), 0, 0, index)
+        body += _attr(IFA_LOCAL, packed) + _attr(IFA_ADDRESS, packed)
+        self._request(RTM_NEWADDR, NLM_F_CREATE | NLM_F_EXCL | NLM_F_ACK, body)
+
+    def delete_ipv4(self, name, address, prefixlen=32):
+        index = self.link_index(name)
+        if index is None:
+            return
+        packed = socket.inet_aton(address)
+        body = _IFADDRMSG.pack(socket.AF_INET, int(prefixlen), 0, 0, index)
+        body += _attr(IFA_LOCAL, packed) + _attr(IFA_ADDRESS, packed)
+        self._request(RTM_DELADDR, NLM_F_ACK, body)
+
+    def get_ipv4(self, name):
+        """First IPv4 address on the interface, or None"""
+        index = self.link_index(name)
+        if index is None:
+            return None
+        for msg_type, payload in self._request(RTM_GETADDR, NLM_F_DUMP, _IFADDRMSG.pack(socket.AF_INET, 0, 0, 0, 0)):
+            address = self._parse_ipv4(msg_type, payload, index)
+            if address:
+                return address
+        return None
+
+    def wait_for_ipv4(self, name, timeout):
+        """
+        Block until the interface has an IPv4 address (or timeout) and return it.
+
+        Subscribes to address notifications first and then checks the current
+        state, so an address assigned in between is not missed.
+        """
+        index = self.link_index(name)
+        if index is None:
+            return None
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        try:
+            sock.bind((0, RTMGRP_IPV4_IFADDR))
+            address = self.get_ipv4(name)
+            deadline = time.time() + timeout
+            while not address:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if not readable:
+                    break
+                for msg_type, payload in self._split(sock.recv(self.RECV_SIZE)):
+                    address = address or self._parse_ipv4(msg_type, payload, index)
+            return address
+        finally:
+            sock.close()
+
+    def _parse_ipv4(self, msg_type, payload, index):
+        if msg_type != RTM_NEWADDR or len(payload) < _IFADDRMSG.size:
+            return None
+        family, _, _, _, msg_index = _IFADDRMSG.unpack_from(payload)
+        if family != socket.AF_INET or msg_index != index:
+            return None
+        attrs = _parse_attrs(payload[_IFADDRMSG.size:])
+        packed = attrs.get(IFA_LOCAL) or attrs.get(IFA_ADDRESS)
+        return socket.inet_ntoa(packed) if packed and len(packed) == 4 else None
+
+    # --- Transport ---
+
+    def _next_seq(self):
+        with self._seq_lock:
+            self._seq = (self._seq + 1) & 0xffffffff
+            return self._seq
+
+    def _request(self, msg_type, flags, body):
+        """Send one request and collect the reply messages (dump) or the ack"""
+        seq = self._next_seq()
+        message = _NLMSGHDR.pack(_NLMSGHDR.size + len(body), msg_type, NLM_F_REQUEST | flags, seq, 0) + body
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        try:
+            sock.bind((0, 0))
+            sock.sendall(message)
+            replies = []
+            while True:
+                for reply_type, payload in self._split(sock.recv(self.RECV_SIZE), seq):
+                    if reply_type == NLMSG_DONE:
+                        return replies
+                    if reply_type == NLMSG_ERROR:
+                        error = -struct.unpack_from('=i', payload)[0]
+                        if error == 0:
+                            return replies
+                        if error in (1, 13):    # EPERM, EACCES
+                            raise PermissionError(error, os.strerror(error))
+                        raise NetlinkError(error, os.strerror(error))
+                    replies.append((reply_type, payload))
+                if (flags & NLM_F_DUMP) != NLM_F_DUMP and not flags & NLM_F_ACK:
+                    return replies
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _split(data, seq=None):
+        """Yield (type, payload) for each message in a datagram (optionally only replies to seq)"""
+        offset = 0
+        while offset + _NLMSGHDR.size <= len(data):
+            length, msg_type, _, msg_seq, _ = _NLMSGHDR.unpack_from(data, offset)
+            if length < _NLMSGHDR.size:
+                break
+            if seq is None or msg_seq == seq:
+                yield msg_type, data[offset + _NLMSGHDR.size:offset + length]
+            offset += _align(length)
+
+
+def write_sysctl(key, value):
+    """Set a sysctl through /proc/sys (key like 'net.ipv4.conf.vnic_x.arp_ignore')"""
+    with open('/proc/sys/' + key.replace('.', '/'), 'w') as f:
+        f.write(str(value))
+
+
+def prefix_length(mask):
+    """'24' or '255.255.255.0' -> 24"""
+    mask = str(mask).strip()
+    if mask.isdigit():
+        return int(mask)
+    return ipaddress.IPv4Network(f'0.0.0.0/{mask}').prefixlen
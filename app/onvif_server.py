@@ -0,0 +1,169 @@
+import selectors
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server that is driven by an external event loop and hands requests to a shared pool"""
+
+    def __init__(self, host, port, app, executor):
+        super().__init__(host, port, app)
+        self.executor = executor
+        # The event loop only calls accept() when the socket is readable,
+        # non-blocking mode guards against spurious wakeups
+        self.socket.setblocking(False)
+
+    def get_request(self):
+        request, client_address = super().get_request()
+        # Accepted sockets inherit non-blocking mode on Windows and macOS; the
+        # workers read them with blocking calls
+        request.setblocking(True)
+        return request, client_address
+
+    def process_request(self, request, client_address):
+        """Process incoming request on the shared worker pool"""
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        """Handle one request in a thread from the pool"""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class SharedONVIFServer:
+    """
+    Serves the ONVIF endpoints of every virtual camera from a single event loop.
+
+    Each camera keeps its own listening socket (port and optional vNIC IP), but all
+    sockets are multiplexed by one selector thread, and requests are dispatched to
+    the owning camera's Flask app on one bounded worker pool shared by all cameras.
+    """
+
+    def __init__(self, max_workers=32):
+        self.max_workers = max_workers
+        self.executor = None
+        self.running = False
+        self.thread = None
+        self._selector = selectors.DefaultSelector()
+        self._servers = {}  # camera_id -> PooledWSGIServer
+        self._pending = []  # (action, server, done_event) applied by the event loop thread
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()     # start()/stop() may be called from camera startup workers
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def start(self):
+        """Start the event loop thread (no-op if running)"""
+        with self._start_lock:
+            if self.running:
+                return
+            self.running = True
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='onvif')
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+            print(f"Shared ONVIF server started ({self.max_workers} worker threads)")
+
+    def stop(self):
+        """Stop the event loop and close all listening sockets"""
+        with self._start_lock:
+            if not self.running:
+                return
+            self.running = False
+            self._wake()
+            if self.thread:
+                self.thread.join(timeout=2)
+            with self._lock:
+                # Servers still waiting for removal are closed here as well
+                servers = list(self._servers.values()) + [server for action, server, _ in self._pending if action == 'remove']
+                for server in servers:
+                    # Unregistered so a later start() does not select on closed sockets
+                    try:
+                        self._selector.unregister(server.socket)
+                    except (KeyError, ValueError):
+                        pass
+                    server.server_close()
+                self._servers.clear()
+                for _, _, done in self._pending:
+                    if done:
+                        done.set()
+                self._pending.clear()
+            self.executor.shutdown(wait=False)
+
+    def add_camera(self, camera, app, bind_ip):
+        """Bind a camera's ONVIF port and start serving its app (replaces any previous binding)"""
+        self.start()
+        self.remove_camera(camera.id)
+        server = PooledWSGIServer(bind_ip, camera.onvif_port, app, self.executor)
+        with self._lock:
+            self._servers[camera.id] = server
+            self._pending.append(('add', server, None))
+        self._wake()
+
+    def remove_camera(self, camera_id):
+        """Stop serving a camera and release its port"""
+        done = threading.Event()
+        with self._lock:
+            server = self._servers.pop(camera_id, None)
+            if server:
+                self._pending.append(('remove', server, done))
+        if server:
+            self._wake()
+            # Wait for the event loop to close the socket so the port can be re-bound immediately
+            if threading.current_thread() is not self.thread:
+                done.wait(timeout=2)
+
+    def has_camera(self, camera_id):
+        with self._lock:
+            return camera_id in self._servers
+
+    def _wake(self):
+        """Interrupt select() so pending socket changes are applied"""
+        try:
+            self._wake_w.send(b'\0')
+        except OSError:
+            pass
+
+    def _apply_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for action, server, done in pending:
+            if action == 'add':
+                self._selector.register(server.socket, selectors.EVENT_READ, server)
+            else:
+                try:
+                    self._selector.unregister(server.socket)
+                except (KeyError, ValueError):
+                    pass
+                server.server_close()
+                done.set()
+
+    def _run(self):
+        """Event loop: accept connections on all camera sockets"""
+        while self.running:
+            try:
+                events = self._selector.select()
+            except OSError:
+                continue
+            for key, _ in events:
+                server = key.data
+                if server is None:
+                    try:
+                        while self._wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                    self._apply_pending()
+                    continue
+                try:
+                    # accept() and hand the connection to the worker pool
+                    server._handle_request_noblock()
+                except Exception as e:
+                    print(f"  Shared ONVIF server error: {e}")
@@ -5,7 +5,8 @@ import socket
 import struct
 import threading
 from pathlib import Path
-from flask import Flask, request, Response
+from xml.etree.ElementTree import XMLPullParser, ParseError
+from flask import Flask, request, Response, g
 from flask_cors import CORS
 from datetime import datetime, timezone
 import sys
@@ -25,13 +26,138 @@ else:
 
 from .config import CONFIG_FILE
 
+
+def _local_name(tag):
+    """Strip the namespace from an ElementTree tag ('{ns}GetProfiles' -> 'GetProfiles')"""
+    return tag.rsplit('}', 1)[-1]
+
+
+class SOAPRequest:
+    """The parts of an ONVIF SOAP request the service cares about, parsed once per request"""
+
+    def __init__(self, action=None, username=None, password=None, profile_token=None):
+        self.action = action
+        self.username = username
+        self.password = password
+        self.profile_token = profile_token
+
+    @classmethod
+    def parse(cls, data, action=None):
+        """
+        Parse a SOAP envelope incrementally.
+
+        The operation is the first child of Body unless the caller already knows it
+        from the Content-Type action parameter. Parsing stops as soon as that first
+        Body child is closed, so large or trailing content is never walked.
+        """
+        soap = cls(action=action)
+        parser = XMLPullParser(events=('start', 'end'))
+        depth = 0
+        body_depth = None
+        text_target = None
+        try:
+            parser.feed(data)
+            for event, elem in parser.read_events():
+                name = _local_name(elem.tag)
+                if event == 'start':
+                    depth += 1
+                    if name == 'Body' and body_depth is None:
+                        body_depth = depth
+                    elif body_depth is not None and depth == body_depth + 1 and not soap.action:
+                        soap.action = name
+                    if name in ('Username', 'Password', 'ProfileToken'):
+                        text_target = name
+                else:
+                    if name == text_target:
+                        value = (elem.text or '').strip()
+                        if name == 'Username':
+                            soap.username = value
+                        elif name == 'Password':
+                            soap.password = value
+                        else:
+                            soap.profile_token = value
+                        text_target = None
+                    depth -= 1
+                    if body_depth is not None and depth == body_depth:
+                        # First Body child finished, nothing else is needed
+                        break
+        except ParseError:
+            # Malformed body, keep whatever was found before the error
+            pass
+        return soap
+
+
 class ONVIFService:
+    # SOAP operation -> handler method, shared by the device and media services
+    OPERATIONS = {
+        'GetDeviceInformation': '_handle_get_device_info',
+        'GetCapabilities': '_handle_get_capabilities',
+        'GetServices': '_handle_get_services',
+        'GetSystemDateAndTime': '_handle_get_system_date_time',
+        'GetNetworkInterfaces': '_handle_get_network_interfaces',
+        'GetProfiles': '_handle_get_profiles',
+        'GetStreamUri': '_handle_get_stream_uri',
+        'GetSnapshotUri': '_handle_get_snapshot_uri',
+        'GetVideoSources': '_handle_get_video_sources',
+    }
+
+
     def __init__(self, camera):
         self.camera = camera
         self.app = None
         # Cache for authenticated IPs: {ip: timestamp}
         # Prevents repetitive 401 challenges for recently authenticated clients (30 min TTL)
         self.auth_cache = {}
+        # Pre-encoded responses for static operations: {(operation, local_ip, config_version): bytes}
+        # Invalidated when CameraManager.update_camera bumps camera.config_version
+        self._response_cache = {}
+        self._cache_version = None
+        self._host_ip = None
+        
+    def _get_local_ip(self):
+        """Get the IP advertised in ONVIF URLs (assigned vNIC IP or cached host IP)"""
+        if self.camera.assigned_ip:
+            return self.camera.assigned_ip
+        if self._host_ip is None:
+            self._host_ip = socket.gethostbyname(socket.gethostname())
+        return self._host_ip
+        
+    def _get_cached_response(self, operation, local_ip, mimetype='application/soap+xml'):
+        """Return a cached Response for a static operation, or None"""
+        body = self._response_cache.get((operation, local_ip, getattr(self.camera, 'config_version', 0)))
+        if body is None:
+            return None
+        return Response(body, mimetype=mimetype)
+        
+    def _cache_response(self, operation, local_ip, text, mimetype='application/soap+xml'):
+        """Encode a static response once, cache it and return it"""
+        version = getattr(self.camera, 'config_version', 0)
+        if version != self._cache_version:
+            # Camera config changed, drop everything rendered for the old version
+            self._response_cache = {}
+            self._cache_version = version
+        body = text.encode('utf-8')
+        self._response_cache[(operation, local_ip, version)] = body
+        return Response(body, mimetype=mimetype)
+        
+    def _get_soap_request(self):
+        """Parse the current request's SOAP envelope once and keep it on flask.g"""
+        soap = getattr(g, 'soap', None)
+        if soap is None:
+            # SOAP 1.2 carries the action in the Content-Type, SOAP 1.1 in the SOAPAction header
+            action = request.mimetype_params.get('action') or request.headers.get('SOAPAction', '')
+            action = action.strip('"').rsplit('/', 1)[-1] or None
+            soap = SOAPRequest.parse(request.get_data(), action)
+            g.soap = soap
+        return soap
+        
+    def _dispatch(self, default):
+        """Route the current SOAP request through the operation table"""
+        soap = self._get_soap_request()
+        handler = self.OPERATIONS.get(soap.action, default)
+        if getattr(self.camera, 'debug_mode', False) and soap.action not in self.OPERATIONS:
+            print(f"  [ONVIF] Unhandled operation {soap.action!r}, answering with {default}")
+        return getattr(self, handler)()
         
     def create_app(self):
         """Create the Flask app for ONVIF service"""
@@ -51,8 +177,25 @@ class ONVIFService:
         import os
         os.environ['FLASK_ENV'] = 'production'
         
-        # Get correct local IP for ONVIF URLs (Use assigned IP for Virtual NICs)
-        local_ip = self.camera.assigned_ip if self.camera.assigned_ip else socket.gethostbyname(socket.gethostname())
+        # Request latency metrics (exported on the web UI's /metrics)
+        @app.before_request
+        def start_timer():
+            g.request_start = time.perf_counter()
+        
+        @app.after_request
+        def record_request(response):
+            collector = getattr(self.camera.manager, 'metrics', None) if self.camera.manager else None
+            start = getattr(g, 'request_start', None)
+            if collector and start is not None:
+                # Labels come from a fixed set, so clients cannot create new series
+                soap = getattr(g, 'soap', None)
+                if soap:
+                    operation = soap.action if soap.action in self.OPERATIONS else 'other'
+                else:
+                    operation = request.url_rule.rule if request.url_rule else 'other'
+                collector.observe('onvif_request_duration_seconds', time.perf_counter() - start,
+                                  camera=self.camera.name, operation=operation, status=response.status_code)
+            return response
         
         # Authentication decorator for ONVIF endpoints
         def require_auth(f):
@@ -85,21 +228,12 @@ class ONVIFService:
                     return f(*args, **kwargs)
                 
                 # Check for SOAP WS-UsernameToken (in request body)
-                data = request.get_data(as_text=True)
-                
-                if 'UsernameToken' in data:
-                    # Robust check for Username and Password in SOAP XML
-                    # Supports namespaced tags (wsse:Username) and cleartext passwords
-                    has_user = f'<Username>{self.camera.onvif_username}</Username>' in data or \
-                               f':Username>{self.camera.onvif_username}</' in data
-                    
-                    has_pass = f'>{self.camera.onvif_password}</' in data and \
-                               ('<Password' in data or ':Password' in data)
-
-                    if has_user and has_pass:
-                        # Cache successful authentication
-                        self.auth_cache[client_ip] = current_time
-                        return f(*args, **kwargs)
+                soap = self._get_soap_request()
+                if soap.username is not None and soap.username == self.camera.onvif_username and \
+                   soap.password == self.camera.onvif_password:
+                    # Cache successful authentication
+                    self.auth_cache[client_ip] = current_time
+                    return f(*args, **kwargs)
                 
                 # Authentication failed - return 401
                 return Response(
@@ -116,31 +250,7 @@ class ONVIFService:
                 if request.method == 'GET':
                     return self._get_device_wsdl()
                 
-                # Parse SOAP request
-                soap_body = request.data.decode('utf-8')
-                
-                # GetDeviceInformation
-                if 'GetDeviceInformation' in soap_body:
-                    return self._handle_get_device_info()
-                
-                # GetCapabilities
-                elif 'GetCapabilities' in soap_body:
-                    return self._handle_get_capabilities(local_ip)
-                
-                # GetServices
-                elif 'GetServices' in soap_body:
-                    return self._handle_get_services(local_ip)
-                
-                # GetSystemDateAndTime
-                elif 'GetSystemDateAndTime' in soap_body:
-                    return self._handle_get_system_date_time()
-                
-                # GetNetworkInterfaces
-                elif 'GetNetworkInterfaces' in soap_body:
-                    return self._handle_get_network_interfaces()
-                
-                # Default response
-                return self._handle_get_device_info()
+                return self._dispatch(default='_handle_get_device_info')
                 
             except Exception as e:
                 print(f"  Error handling request: {e}")
@@ -162,23 +272,7 @@ class ONVIFService:
                 if request.method == 'GET':
                     return self._get_media_wsdl()
                 
-                # Parse SOAP request
-                soap_body = request.data.decode('utf-8')
-                
-                # GetProfiles
-                if 'GetProfiles' in soap_body:
-                    return self._handle_get_profiles()
-                
-                # GetStreamUri
-                elif 'GetStreamUri' in soap_body:
-                    return self._handle_get_stream_uri(local_ip)
-                
-                # GetVideoSources
-                elif 'GetVideoSources' in soap_body:
-                    return self._handle_get_video_sources()
-                
-                # Default: return profiles
-                return self._handle_get_profiles()
+                return self._dispatch(default='_handle_get_profiles')
                 
             except Exception as e:
                 print(f"  Error in media service: {e}")
@@ -186,10 +280,39 @@ class ONVIFService:
                 traceback.print_exc()
                 return Response("Internal Server Error", status=500)
                 
+        # Snapshot image referenced by GetSnapshotUri (latest frame from the shared grabber)
+        @app.route('/onvif/snapshot', methods=['GET'], endpoint=f'snapshot_{self.camera.id}')
+        @require_auth
+        def snapshot():
+            snapshots = getattr(self.camera.manager, 'snapshots', None) if self.camera.manager else None
+            if not snapshots:
+                return Response("Snapshots not available", status=503)
+            try:
+                content, etag = snapshots.get_snapshot(self.camera)
+            except Exception as e:
+                print(f"  Error capturing snapshot for {self.camera.name}: {e}")
+                return Response("Internal Server Error", status=500)
+            if content is None:
+                return Response("No frame available", status=503)
+            
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = Response(content, mimetype='image/jpeg')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+                
         return app
 
     def start_discovery_service(self, local_ip):
         """Start WS-Discovery multicast service for ONVIF discovery"""
+        # Prefer the manager's shared responder (one socket/thread for all cameras)
+        responder = getattr(self.camera.manager, 'discovery', None) if self.camera.manager else None
+        if responder:
+            responder.register(self.camera, local_ip)
+            return
+        
         # Check if discovery is already running for this camera
         if hasattr(self, '_discovery_thread') and self._discovery_thread and self._discovery_thread.is_alive():
             return
@@ -280,6 +403,11 @@ class ONVIFService:
 
     def _handle_get_device_info(self):
         """Handle GetDeviceInformation request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetDeviceInformation', local_ip)
+        if cached:
+            return cached
+        
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
 <SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
                    xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
@@ -294,10 +422,15 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response('GetDeviceInformation', local_ip, soap_response)
 
-    def _handle_get_capabilities(self, local_ip):
+    def _handle_get_capabilities(self):
         """Handle GetCapabilities request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetCapabilities', local_ip)
+        if cached:
+            return cached
+        
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
 <SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
                    xmlns:tds="http://www.onvif.org/ver10/device/wsdl"
@@ -377,10 +510,15 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response('GetCapabilities', local_ip, soap_response)
 
-    def _handle_get_services(self, local_ip):
+    def _handle_get_services(self):
         """Handle GetServices request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetServices', local_ip)
+        if cached:
+            return cached
+        
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
 <SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
                    xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
@@ -406,7 +544,7 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response('GetServices', local_ip, soap_response)
 
     def _handle_get_system_date_time(self):
         """Handle GetSystemDateAndTime request - Always uses UTC"""
@@ -459,6 +597,11 @@ class ONVIFService:
 
     def _handle_get_network_interfaces(self):
         """Handle GetNetworkInterfaces request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetNetworkInterfaces', local_ip)
+        if cached:
+            return cached
+        
         mac = self.camera.mac_address
         
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
@@ -489,10 +632,15 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response('GetNetworkInterfaces', local_ip, soap_response)
 
     def _handle_get_profiles(self):
         """Handle GetProfiles request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetProfiles', local_ip)
+        if cached:
+            return cached
+        
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
 <SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
                    xmlns:trt="http://www.onvif.org/ver10/media/wsdl"
@@ -559,18 +707,22 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response('GetProfiles', local_ip, soap_response)
 
-    def _handle_get_stream_uri(self, local_ip):
+    def _handle_get_stream_uri(self):
         """Handle GetStreamUri request"""
-        # Parse the SOAP request to determine which profile is being requested
-        soap_body = request.data.decode('utf-8')
+        local_ip = self._get_local_ip()
         
         # Check which profile token is requested
+        token = self._get_soap_request().profile_token or ''
         stream_path = f"{self.camera.path_name}_main"  # Default to main stream
-        if 'profile_2' in soap_body or 'subStream' in soap_body or 'SubStream' in soap_body:
+        if token == 'profile_2' or token.lower() == 'substream':
             stream_path = f"{self.camera.path_name}_sub"
         
+        cached = self._get_cached_response(f'GetStreamUri:{stream_path}', local_ip)
+        if cached:
+            return cached
+        
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
 <SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
                    xmlns:trt="http://www.onvif.org/ver10/media/wsdl"
@@ -587,11 +739,39 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response(f'GetStreamUri:{stream_path}', local_ip, soap_response)
+
+    def _handle_get_snapshot_uri(self):
+        """Handle GetSnapshotUri request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetSnapshotUri', local_ip)
+        if cached:
+            return cached
+        
+        soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
+<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
+                   xmlns:trt="http://www.onvif.org/ver10/media/wsdl"
+                   xmlns:tt="http://www.onvif.org/ver10/schema">
+    <SOAP-ENV:Body>
+        <trt:GetSnapshotUriResponse>
+            <trt:MediaUri>
+                <tt:Uri>http://{local_ip}:{self.camera.onvif_port}/onvif/snapshot</tt:Uri>
+                <tt:InvalidAfterConnect>false</tt:InvalidAfterConnect>
+                <tt:InvalidAfterReboot>false</tt:InvalidAfterReboot>
+                <tt:Timeout>PT60S</tt:Timeout>
+            </trt:MediaUri>
+        </trt:GetSnapshotUriResponse>
+    </SOAP-ENV:Body>
+</SOAP-ENV:Envelope>"""
+        
+        return self._cache_response('GetSnapshotUri', local_ip, soap_response)
 
     def _get_device_wsdl(self):
         """Return device service WSDL"""
-        local_ip = self.camera.assigned_ip if self.camera.assigned_ip else socket.gethostbyname(socket.gethostname())
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('DeviceWSDL', local_ip, mimetype='text/xml')
+        if cached:
+            return cached
         
         wsdl = f"""<?xml version="1.0" encoding="UTF-8"?>
 <definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
@@ -604,11 +784,14 @@ class ONVIFService:
         </port>
     </service>
 </definitions>"""
-        return Response(wsdl, mimetype='text/xml')
+        return self._cache_response('DeviceWSDL', local_ip, wsdl, mimetype='text/xml')
 
     def _get_media_wsdl(self):
         """Return media service WSDL"""
-        local_ip = self.camera.assigned_ip if self.camera.assigned_ip else socket.gethostbyname(socket.gethostname())
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('MediaWSDL', local_ip, mimetype='text/xml')
+        if cached:
+            return cached
         
         wsdl = f"""<?xml version="1.0" encoding="UTF-8"?>
 <definitions xmlns="http://schemas.xmlsoap.org/wsdl/"
@@ -621,10 +804,15 @@ class ONVIFService:
         </port>
     </service>
 </definitions>"""
-        return Response(wsdl, mimetype='text/xml')
+        return self._cache_response('MediaWSDL', local_ip, wsdl, mimetype='text/xml')
 
     def _handle_get_video_sources(self):
         """Handle GetVideoSources request"""
+        local_ip = self._get_local_ip()
+        cached = self._get_cached_response('GetVideoSources', local_ip)
+        if cached:
+            return cached
+        
         soap_response = f"""<?xml version="1.0" encoding="UTF-8"?>
 <SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"
                    xmlns:trt="http://www.onvif.org/ver10/media/wsdl"
@@ -649,4 +837,4 @@ class ONVIFService:
     </SOAP-ENV:Body>
 </SOAP-ENV:Envelope>"""
         
-        return Response(soap_response, mimetype='application/soap+xml')
+        return self._cache_response('GetVideoSources', local_ip, soap_response)
@@ -3,14 +3,56 @@ import subprocess
 import importlib.util
 import platform
 import collections
+import itertools
+import re
 import threading
+import time
+
+# Log levels in increasing severity (used for ?level= filtering)
+LOG_LEVELS = ('debug', 'info', 'warn', 'error')
+
+# Thread name of the MediaMTX and FFmpeg output readers; their lines are MediaMTX (or FFmpeg) output
+MEDIAMTX_OUTPUT_THREAD = 'mediamtx-output'
+
+_MEDIAMTX_LINE_RE = re.compile(r'^\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2} (DEB|INF|WAR|ERR) ')
+_MEDIAMTX_LEVELS = {'DEB': 'debug', 'INF': 'info', 'WAR': 'warn', 'ERR': 'error'}
+
+
+def _classify_line(line, thread_name):
+    """Return (source, level) for a captured output line"""
+    if thread_name == MEDIAMTX_OUTPUT_THREAD:
+        match = _MEDIAMTX_LINE_RE.match(line)
+        if match:
+            return 'mediamtx', _MEDIAMTX_LEVELS[match.group(1)]
+        # Anything else on MediaMTX's stdout comes from the FFmpeg processes it runs
+        source = 'ffmpeg'
+    else:
+        source = 'app'
+    lowered = line.lower()
+    if 'error' in lowered or 'failed' in lowered or 'traceback' in lowered:
+        return source, 'error'
+    if 'warning' in lowered or 'warn:' in lowered:
+        return source, 'warn'
+    return source, 'info'
+
 
 class Logger:
+    """
+    Captures stdout/stderr into a bounded store of line records.
+
+    Every complete line becomes a record with a monotonic id, timestamp, source
+    (app / mediamtx / ffmpeg) and level, so clients can fetch only the lines
+    after the last id they have seen.
+    """
+
     def __init__(self, max_lines=2000):
         self._buffer = collections.deque(maxlen=max_lines)
         self._lock = threading.Lock()
         self._stdout = sys.stdout
         self._stderr = sys.stderr
+        self._listeners = []
+        self._next_id = 1
+        self._partial = {}  # thread ident -> unfinished line
 
     def write(self, message):
         if not message:
@@ -22,17 +64,76 @@ class Logger:
                 message = message.decode('utf-8', errors='replace')
             except:
                 message = str(message)
-                
-        with self._lock:
-            self._buffer.append(message)
+        
         self._stdout.write(message)
+        
+        thread = threading.current_thread()
+        records = []
+        with self._lock:
+            # Lines are assembled per thread so concurrent prints don't interleave
+            text = self._partial.pop(thread.ident, '') + message
+            lines = text.split('\n')
+            if lines[-1]:
+                if len(self._partial) > 100:
+                    # Threads that exited mid-line, forget their leftovers
+                    self._partial.clear()
+                self._partial[thread.ident] = lines[-1]
+            now = time.time()
+            for line in lines[:-1]:
+                line = line.rstrip('\r')
+                source, level = _classify_line(line, thread.name)
+                record = {'id': self._next_id, 'ts': now, 'source': source, 'level': level, 'text': line}
+                self._next_id += 1
+                self._buffer.append(record)
+                records.append(record)
+        
+        # Push to live listeners (e.g. the dashboard event stream)
+        for record in records:
+            for listener in self._listeners:
+                try:
+                    listener(record)
+                except Exception:
+                    pass
 
     def flush(self):
         self._stdout.flush()
 
     def get_logs(self):
         with self._lock:
-            return "".join(self._buffer)
+            return "".join(record['text'] + "\n" for record in self._buffer)
+
+    def get_records(self, after=0, source=None, level=None, limit=None):
+        """Records with id > after, optionally filtered by source and minimum level"""
+        with self._lock:
+            if not self._buffer:
+                return [], self._next_id - 1
+            # Ids are contiguous, so the start offset is computed instead of scanned
+            start = max(0, after - self._buffer[0]['id'] + 1)
+            records = list(itertools.islice(self._buffer, start, None))
+            last_id = self._next_id - 1
+        records = [r for r in records if record_matches(r, source, level)]
+        if limit:
+            records = records[-limit:]
+        return records, last_id
+
+    def add_listener(self, callback):
+        """Call callback(record) for every line written from now on"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        try:
+            self._listeners.remove(callback)
+        except ValueError:
+            pass
+
+
+def record_matches(record, source=None, level=None):
+    """Check a log record against optional source and minimum level filters"""
+    if source and record['source'] != source:
+        return False
+    if level in LOG_LEVELS and LOG_LEVELS.index(record['level']) < LOG_LEVELS.index(level):
+        return False
+    return True
 
 _logger_instance = None
 
@@ -49,6 +150,19 @@ def get_captured_logs():
         return _logger_instance.get_logs()
     return ""
 
+def get_log_records(after=0, source=None, level=None, limit=None):
+    if _logger_instance:
+        return _logger_instance.get_records(after, source, level, limit)
+    return [], 0
+
+def add_log_listener(callback):
+    if _logger_instance:
+        _logger_instance.add_listener(callback)
+
+def remove_log_listener(callback):
+    if _logger_instance:
+        _logger_instance.remove_listener(callback)
+
 # Auto-install requirements
 def check_and_install_requirements():
     """Check and install required packages automatically"""
@@ -1738,6 +1738,56 @@ def get_web_ui_html(current_settings=None):
                         <input type="text" class="form-input" id="ffmpeg_processArgs" style="font-size: 13px; padding: 10px; font-family: 'Consolas', monospace; background: #1a202c; color: #ffffff;">
                     </div>
 
+                    <h3 style="font-size: 14px; margin: 20px 0 12px 0; color: #ffffff; border-bottom: 2px solid var(--primary-color); padding-bottom: 6px; display: flex; align-items: center; gap: 8px;">
+                        <i class="fas fa-network-wired" style="font-size: 12px; color: var(--primary-color);"></i> ONVIF Service
+                    </h3>
+                    <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px;">
+                        <div class="form-group" style="margin-bottom: 12px;">
+                            <label style="display: flex; align-items: center; gap: 8px; cursor: pointer;">
+                                <input type="checkbox" id="onvif_sharedServer" style="width: auto; cursor: pointer;">
+                                <span class="form-label" style="font-size: 12px; margin: 0; color: #ffffff;">Shared ONVIF Server</span>
+                            </label>
+                            <small style="color: #a0aec0; font-size: 11px; margin-top: 4px; display: block;">Serve all cameras from one event loop and worker pool. Recommended for large installs. Applied after a server restart.</small>
+                        </div>
+                        <div class="form-group" style="margin-bottom: 12px;">
+                            <label class="form-label" style="font-size: 12px; margin-bottom: 4px; color: #ffffff;">Shared Worker Threads</label>
+                            <input type="number" class="form-input" id="onvif_workerThreads" min="1" style="font-size: 13px; padding: 8px 10px; background: rgba(255,255,255,0.05); color: #ffffff;">
+                        </div>
+                    </div>
+
+                    <h3 style="font-size: 14px; margin: 20px 0 12px 0; color: #ffffff; border-bottom: 2px solid var(--primary-color); padding-bottom: 6px; display: flex; align-items: center; gap: 8px;">
+                        <i class="fas fa-rocket" style="font-size: 12px; color: var(--primary-color);"></i> Camera Startup
+                    </h3>
+                    <div class="form-group" style="margin-bottom: 12px;">
+                        <label class="form-label" style="font-size: 12px; margin-bottom: 4px; color: #ffffff;">Parallel Camera Starts</label>
+                        <input type="number" class="form-input" id="startup_concurrency" min="1" style="font-size: 13px; padding: 8px 10px; background: rgba(255,255,255,0.05); color: #ffffff;">
+                        <small style="color: #a0aec0; font-size: 11px; margin-top: 4px; display: block;">How many cameras are brought up at once on boot and "Start All". Higher values speed up large Virtual NIC installs that wait on DHCP.</small>
+                    </div>
+
+                    <h3 style="font-size: 14px; margin: 20px 0 12px 0; color: #ffffff; border-bottom: 2px solid var(--primary-color); padding-bottom: 6px; display: flex; align-items: center; gap: 8px;">
+                        <i class="fas fa-th-large" style="font-size: 12px; color: var(--primary-color);"></i> GridFusion
+                    </h3>
+                    <div class="form-group" style="margin-bottom: 12px;">
+                        <label style="display: flex; align-items: center; gap: 8px; cursor: pointer;">
+                            <input type="checkbox" id="gridFusion_sharedDecode" style="width: auto; cursor: pointer;">
+                            <span class="form-label" style="font-size: 12px; margin: 0; color: #ffffff;">Shared Decode Across Layouts</span>
+                        </label>
+                        <small style="color: #a0aec0; font-size: 11px; margin-top: 4px; display: block;">Render layouts that show the same camera in one FFmpeg process so that camera is only pulled and decoded once. Layouts with no camera in common always get their own process. Turn off to run every layout in its own process.</small>
+                    </div>
+                    <div class="form-group" style="margin-bottom: 12px;">
+                        <label class="form-label" style="font-size: 12px; margin-bottom: 4px; color: #ffffff;">Compositor Backend</label>
+                        <select class="form-input" id="gridFusion_backend" style="font-size: 13px; padding: 8px 10px; background: rgba(255,255,255,0.05); color: #ffffff;">
+                            <option value="ffmpeg">FFmpeg filter graph</option>
+                            <option value="python">In-process (NumPy)</option>
+                        </select>
+                        <small style="color: #a0aec0; font-size: 11px; margin-top: 4px; display: block;">In-process keeps the last frame of a stalled camera instead of stalling the layout, and applies layout edits without reloading MediaMTX. Requires NumPy (pip install numpy).</small>
+                    </div>
+                    <div class="form-group" style="margin-bottom: 12px;">
+                        <label class="form-label" style="font-size: 12px; margin-bottom: 4px; color: #ffffff;">Live Edit Control Port</label>
+                        <input type="number" class="form-input" id="gridFusion_controlPort" min="1024" max="65535" style="font-size: 13px; padding: 8px 10px; background: rgba(255,255,255,0.05); color: #ffffff;">
+                        <small style="color: #a0aec0; font-size: 11px; margin-top: 4px; display: block;">First local port FFmpeg listens on for tile moves and resizes (one port per GridFusion process, FFmpeg with zmq support only). A port already in use turns live edits off for that layout.</small>
+                    </div>
+
                     <div style="background: rgba(237, 137, 54, 0.1); border-left: 3px solid #ed8936; padding: 10px; margin-top: 15px; border-radius: 4px;">
                         <small style="color: #f6ad55; font-size: 11px; font-weight: 600; display: block;">
                             <i class="fas fa-exclamation-triangle"></i> Note: MediaMTX will restart automatically to apply these changes. Incorrect FFmpeg arguments may cause camera streams to fail.
@@ -1966,10 +2016,12 @@ def get_web_ui_html(current_settings=None):
 
         function openLogsModal() {{
             document.getElementById('logs-modal').classList.add('active');
-            refreshLogs();
-            // Auto-refresh logs every 3 seconds while open
+            refreshLogs(true);
+            // Auto-refresh logs every 3 seconds while open (new lines are pushed when the event stream is up)
             if (logInterval) clearInterval(logInterval);
-            logInterval = setInterval(refreshLogs, 3000);
+            logInterval = setInterval(() => {{
+                if (!eventsConnected) refreshLogs();
+            }}, 3000);
         }}
 
         function closeLogsModal() {{
@@ -1980,21 +2032,49 @@ def get_web_ui_html(current_settings=None):
             }}
         }}
 
-        async function refreshLogs() {{
+        // Id of the last log record shown; only newer records are fetched
+        let logCursor = 0;
+        // Records kept in the log modal while it follows new output
+        const MAX_LOG_RECORDS = 2000;
+
+        function appendLogRecords(records) {{
+            const container = document.getElementById('logs-container');
+            const fresh = records.filter(r => r.id > logCursor);
+            if (fresh.length === 0) return;
+            logCursor = fresh[fresh.length - 1].id;
+            
+            if (container.dataset.empty === 'true') {{
+                container.textContent = '';
+                container.dataset.empty = 'false';
+            }}
+            // One text node per record, so the oldest can be dropped past the cap
+            const fragment = document.createDocumentFragment();
+            for (const r of fresh) {{
+                // Simple ANSI escape code stripping (common in terminal output)
+                fragment.appendChild(document.createTextNode(r.text.replace(/\u001b\\[[0-9;]*[a-zA-Z]/g, '') + '\\n'));
+            }}
+            container.appendChild(fragment);
+            while (container.childNodes.length > MAX_LOG_RECORDS) {{
+                container.removeChild(container.firstChild);
+            }}
+            
+            if (document.getElementById('autoScrollLogs').checked) {{
+                container.scrollTop = container.scrollHeight;
+            }}
+        }}
+
+        async function refreshLogs(reset = false) {{
             try {{
-                const response = await fetch('/api/logs');
+                const container = document.getElementById('logs-container');
+                if (reset) {{
+                    logCursor = 0;
+                    container.textContent = "No logs available.";
+                    container.dataset.empty = 'true';
+                }}
+                const response = await fetch(`/api/logs?after=${{logCursor}}`);
                 if (response.ok) {{
                     const data = await response.json();
-                    const container = document.getElementById('logs-container');
-                    
-                    // Simple ANSI escape code stripping (common in terminal output)
-                    const cleanLogs = data.logs.replace(/\u001b\\[[0-9;]*[a-zA-Z]/g, '');
-                    
-                    container.textContent = cleanLogs || "No logs available.";
-                    
-                    if (document.getElementById('autoScrollLogs').checked) {{
-                        container.scrollTop = container.scrollHeight;
-                    }}
+                    appendLogRecords(data.records || []);
                 }}
             }} catch (error) {{
                 console.error('Error fetching logs:', error);
@@ -2257,6 +2337,12 @@ def get_web_ui_html(current_settings=None):
             }}
         }});
 
+        function dhcpLeaseTitle(lease) {{
+            if (!lease) return '';
+            const fmt = t => t ? new Date(t * 1000).toLocaleTimeString() : '-';
+            return `DHCP ${{lease.state}} from ${{lease.server || '-'}} | renews ${{fmt(lease.renewAt)}} | expires ${{fmt(lease.expiresAt)}}`;
+        }}
+
         function getCameraCardContent(cam, serverIp) {{
             const displayIp = cam.assignedIp || serverIp;
             return `
@@ -2267,7 +2353,8 @@ def get_web_ui_html(current_settings=None):
                             <div class="camera-name">${{cam.name}}</div>
                         </div>
                         <div style="display: flex; align-items: center; gap: 8px; margin-left: 24px;">
-                            ${{cam.assignedIp ? `<div class="status-badge running" style="width: auto; height: auto; padding: 2px 6px; border-radius: 4px; font-size: 10px; font-weight: 600;">${{cam.assignedIp}}</div>` : ''}}
+                            ${{cam.assignedIp ? `<div class="status-badge running" style="width: auto; height: auto; padding: 2px 6px; border-radius: 4px; font-size: 10px; font-weight: 600;" title="${{dhcpLeaseTitle(cam.dhcpLease)}}">${{cam.assignedIp}}</div>` : ''}}
+                            ${{cam.dhcpLease && cam.dhcpLease.state !== 'bound' ? `<div style="padding: 2px 6px; border-radius: 4px; font-size: 10px; font-weight: 600; background: #ed8936; color: white; white-space: nowrap;" title="${{dhcpLeaseTitle(cam.dhcpLease)}}">DHCP ${{cam.dhcpLease.state}}</div>` : ''}}
                             ${{cam.useVirtualNic && cam.nicMac ? `<div style="padding: 2px 6px; border-radius: 4px; font-size: 10px; font-weight: 600; background: var(--text-muted); color: white; white-space: nowrap;">${{cam.nicMac}}</div>` : ''}}
                         </div>
                         <div style="margin-left: 24px; margin-top: 4px;">
@@ -3218,6 +3305,16 @@ def get_web_ui_html(current_settings=None):
                 document.getElementById('ffmpeg_processArgs').value = '-c:v libx264 -preset ultrafast -tune zerolatency -g 30';
                 document.getElementById('ffmpeg_hardwareEncoding').checked = false;
                 
+                // ONVIF Defaults
+                document.getElementById('onvif_sharedServer').checked = false;
+                document.getElementById('onvif_workerThreads').value = 32;
+                
+                // Startup Defaults
+                document.getElementById('startup_concurrency').value = 8;
+                document.getElementById('gridFusion_sharedDecode').checked = true;
+                document.getElementById('gridFusion_backend').value = 'ffmpeg';
+                document.getElementById('gridFusion_controlPort').value = 5590;
+                
                 showToast('Settings reset to defaults. Click "Save Settings" to apply.');
             }}
         }}
@@ -3288,6 +3385,15 @@ def get_web_ui_html(current_settings=None):
                             document.getElementById('ffmpeg_processArgs').value = adv.ffmpeg.processArgs || '';
                             document.getElementById('ffmpeg_hardwareEncoding').checked = adv.ffmpeg.hardwareEncoding === true;
                         }}
+                        const onvifAdv = adv.onvif || {{}};
+                        document.getElementById('onvif_sharedServer').checked = onvifAdv.sharedServer === true;
+                        document.getElementById('onvif_workerThreads').value = onvifAdv.workerThreads || 32;
+                        const startupAdv = adv.startup || {{}};
+                        document.getElementById('startup_concurrency').value = startupAdv.concurrency || 8;
+                        const gridFusionAdv = adv.gridFusion || {{}};
+                        document.getElementById('gridFusion_sharedDecode').checked = gridFusionAdv.sharedDecode !== false;
+                        document.getElementById('gridFusion_backend').value = gridFusionAdv.backend || 'ffmpeg';
+                        document.getElementById('gridFusion_controlPort').value = gridFusionAdv.controlPort || 5590;
                     }}
                     
                     const authEnabledField = document.getElementById('authEnabled');
@@ -3385,6 +3491,18 @@ def get_web_ui_html(current_settings=None):
                         inputArgs: document.getElementById('ffmpeg_inputArgs').value,
                         processArgs: document.getElementById('ffmpeg_processArgs').value,
                         hardwareEncoding: document.getElementById('ffmpeg_hardwareEncoding').checked
+                    }},
+                    onvif: {{
+                        sharedServer: document.getElementById('onvif_sharedServer').checked,
+                        workerThreads: parseInt(document.getElementById('onvif_workerThreads').value || 32)
+                    }},
+                    startup: {{
+                        concurrency: parseInt(document.getElementById('startup_concurrency').value || 8)
+                    }},
+                    gridFusion: {{
+                        sharedDecode: document.getElementById('gridFusion_sharedDecode').checked,
+                        backend: document.getElementById('gridFusion_backend').value,
+                        controlPort: parseInt(document.getElementById('gridFusion_controlPort').value || 5590)
                     }}
                 }},
                 authEnabled: document.getElementById('authEnabled').checked,
@@ -3668,9 +3786,22 @@ def get_web_ui_html(current_settings=None):
                     fetch('/api/analytics')
                 ]);
                 
-                const stats = await statsResp.json();
-                const analytics = await analyticsResp.json();
-                
+                latestStats = await statsResp.json();
+                latestAnalytics = await analyticsResp.json();
+                renderStats();
+            }} catch (e) {{
+                console.error("Stats fetch failed:", e);
+            }}
+        }}
+        
+        // Latest values (from polling or the event stream)
+        let latestStats = {{}};
+        let latestAnalytics = {{}};
+        
+        function renderStats() {{
+            const stats = latestStats;
+            const analytics = latestAnalytics;
+            try {{
                 // Update global server stats
                 if (stats.cpu_percent !== undefined) {{
                     let totalBitrate = 0;
@@ -3723,10 +3854,54 @@ def get_web_ui_html(current_settings=None):
                 }});
                 
             }} catch (e) {{
-                console.error("Stats fetch failed:", e);
+                console.error("Stats render failed:", e);
             }}
         }}
         
+        // Server-Sent Events: pushed stats/analytics/cameras/logs, polling is the fallback
+        let eventsConnected = false;
+        
+        function connectEvents() {{
+            if (!window.EventSource) return;
+            const es = new EventSource('/api/events');
+            
+            es.onopen = () => {{
+                eventsConnected = true;
+                // Catch up on log lines missed while disconnected
+                if (document.getElementById('logs-modal').classList.contains('active')) refreshLogs();
+            }};
+            es.onerror = () => {{ eventsConnected = false; }};  // Browser reconnects on its own
+            
+            es.addEventListener('stats', e => {{
+                latestStats = JSON.parse(e.data);
+                renderStats();
+            }});
+            es.addEventListener('analytics', e => {{
+                latestAnalytics = JSON.parse(e.data);
+                renderStats();
+            }});
+            es.addEventListener('cameras', e => {{
+                const newCameras = JSON.parse(e.data);
+                if (Array.isArray(newCameras)) {{
+                    cameras = newCameras;
+                    renderCameras();
+                    if (matrixActive) renderMatrix();
+                    renderStats();
+                }}
+            }});
+            es.addEventListener('startup', e => {{
+                const progress = JSON.parse(e.data);
+                if (!progress.running && progress.total > 1) {{
+                    const failed = progress.failed ? `, ${{progress.failed}} failed` : '';
+                    showToast(`Started ${{progress.started}}/${{progress.total}} cameras${{failed}}`, progress.failed ? 'error' : 'success');
+                }}
+            }});
+            es.addEventListener('log', e => {{
+                if (!document.getElementById('logs-modal').classList.contains('active')) return;
+                appendLogRecords([JSON.parse(e.data)]);
+            }});
+        }}
+        
         function applyTheme(theme) {{
             // Remove all possible theme classes
             const themes = ['dark', 'nord', 'dracula', 'solar-light', 'midnight', 'emerald', 'sunset', 'matrix', 'slate', 'cyberpunk', 'amoled'];
@@ -3789,10 +3964,18 @@ def get_web_ui_html(current_settings=None):
             if (settings.theme) applyTheme(settings.theme);
             if (settings.gridColumns) applyGridLayout(settings.gridColumns);
             await updateStats();
+            connectEvents();
             
-            // Auto-refresh data and stats
-            setInterval(loadData, 5000);
-            setInterval(updateStats, 3000);
+            // Auto-refresh data and stats (polling only while the event stream is down;
+            // settings are still re-read every 30s since they are not pushed)
+            let dataTicks = 0;
+            setInterval(() => {{
+                dataTicks++;
+                if (!eventsConnected || dataTicks % 6 === 0) loadData();
+            }}, 5000);
+            setInterval(() => {{
+                if (!eventsConnected) updateStats();
+            }}, 3000);
         }}
         
         init();
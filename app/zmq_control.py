@@ -0,0 +1,115 @@
+import socket
+import struct
+
+# Minimal ZMTP 3.0 client for FFmpeg's zmq filter, so filter commands can be sent
+# to a running GridFusion graph without depending on pyzmq. Only what the filter
+# needs: NULL security and request/reply envelopes.
+#
+# The filter reads the queued commands each time a frame passes, so a batch is
+# written in one go (as a DEALER, which need not wait for each reply) and lands
+# on the same frame instead of one command per frame.
+
+_GREETING = (b'\xff' + b'\x00' * 8 + b'\x7f'    # Signature
+             + b'\x03\x00'                      # ZMTP 3.0
+             + b'NULL'.ljust(20, b'\x00')       # Security mechanism
+             + b'\x00'                          # as-server
+             + b'\x00' * 31)
+
+_FLAG_MORE = 0x01
+_FLAG_LONG = 0x02
+_FLAG_COMMAND = 0x04
+
+
+class CommandError(OSError):
+    """The filter graph rejected a command (errno is FFmpeg's error code)"""
+
+
+def _frame(body, flags=0):
+    if len(body) > 255:
+        return struct.pack('>BQ', flags | _FLAG_LONG, len(body)) + body
+    return struct.pack('>BB', flags, len(body)) + body
+
+
+class FilterControl:
+    """
+    Connection to an FFmpeg zmq filter (e.g. 'tcp://127.0.0.1:5590').
+
+    send()/send_many() take filter commands in the filter's 'TARGET COMMAND ARG'
+    form and raise CommandError if FFmpeg reports a failure, OSError if it cannot
+    be reached.
+    """
+
+    TIMEOUT = 2
+
+    def __init__(self, address, timeout=TIMEOUT):
+        host, _, port = address.replace('tcp://', '').rpartition(':')
+        self.sock = socket.create_connection((host, int(port)), timeout=timeout)
+        try:
+            self.sock.sendall(_GREETING)
+            self._recv_exact(len(_GREETING))
+            ready = b'\x05READY' + b'\x0bSocket-Type' + struct.pack('>I', 6) + b'DEALER'
+            self.sock.sendall(_frame(ready, _FLAG_COMMAND))
+            flags, _ = self._recv_frame()
+            if not flags & _FLAG_COMMAND:
+                raise OSError("Unexpected ZMTP handshake reply")
+        except Exception:
+            self.sock.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def send(self, command):
+        """Send one command and return FFmpeg's reply text"""
+        return self.send_many([command])[0]
+
+    def send_many(self, commands):
+        """Send commands in one write, then collect the replies (in order)"""
+        # REQ-style envelope: empty delimiter frame, then the body
+        self.sock.sendall(b''.join(_frame(b'', _FLAG_MORE) + _frame(command.encode()) for command in commands))
+        replies = [self._recv_reply() for _ in commands]
+        for command, reply in zip(commands, replies):
+            code, _, message = reply.partition(' ')
+            if code.lstrip('-').isdigit() and int(code) != 0:
+                raise CommandError(-int(code), f"{command}: {message or reply}")
+        return replies
+
+    def _recv_reply(self):
+        parts = []
+        while True:
+            flags, body = self._recv_frame()
+            if flags & _FLAG_COMMAND:
+                continue
+            parts.append(body)
+            if not flags & _FLAG_MORE:
+                break
+        return parts[-1].decode(errors='replace')
+
+    def _recv_frame(self):
+        flags, = self._recv_exact(1)
+        if flags & _FLAG_LONG:
+            size, = struct.unpack('>Q', self._recv_exact(8))
+        else:
+            size, = self._recv_exact(1)
+        return flags, self._recv_exact(size)
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by FFmpeg")
+            data += chunk
+        return data
+
+
+def send_commands(address, commands, timeout=FilterControl.TIMEOUT):
+    """Send several commands over one connection, applied on the same frame"""
+    with FilterControl(address, timeout) as control:
+        return control.send_many(commands)
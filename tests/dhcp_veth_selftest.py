@@ -0,0 +1,146 @@
+"""
+DHCP client test against a stand-in server over a veth pair (Linux, root only).
+
+    sudo python -m tests.dhcp_veth_selftest [--leases 6] [--lease-time 20]
+
+Binds the leases on macvlans, broadcasts a malformed reply, waits for the T1
+renewals and releases everything. Exits non-zero if a step failed.
+"""
+import socket
+import struct
+import subprocess
+import threading
+import time
+
+from app.dhcp import (CLIENT_PORT, DHCPACK, DHCPDISCOVER, DHCPOFFER, DHCPRELEASE, DHCPREQUEST, MAGIC_COOKIE,
+                      OPT_END, OPT_LEASE_TIME, OPT_MESSAGE_TYPE, OPT_SERVER_ID, OPT_SUBNET_MASK, SERVER_PORT,
+                      DHCPClient)
+from app.linux_network import LinuxNetworkManager
+
+BOOTP = struct.Struct('!BBBBIHH4s4s4s4s16s64s128s')
+
+
+def standin_server(interface, server_ip, lease_time, log, stop):
+    """Minimal DHCP server answering on one interface"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, interface.encode() + b'\0')
+    sock.bind(('', SERVER_PORT))
+    sock.settimeout(0.5)
+    pool = {}
+    subnet = server_ip.rsplit('.', 1)[0]
+    while not stop.is_set():
+        try:
+            data, _ = sock.recvfrom(2048)
+        except socket.timeout:
+            continue
+        fields = BOOTP.unpack_from(data)
+        options = {}
+        offset = BOOTP.size + 4
+        while offset < len(data) and data[offset] != OPT_END:
+            if data[offset] == 0:
+                offset += 1
+                continue
+            options[data[offset]] = data[offset + 2:offset + 2 + data[offset + 1]]
+            offset += 2 + data[offset + 1]
+        message_type = options[OPT_MESSAGE_TYPE][0]
+        mac = fields[11][:6]
+        ip = pool.setdefault(mac, f'{subnet}.{100 + len(pool)}')
+        ciaddr = socket.inet_ntoa(fields[7])
+        log.append((message_type, mac, ciaddr))
+        if message_type == DHCPRELEASE:
+            continue
+        reply = BOOTP.pack(2, 1, 6, 0, fields[4], 0, fields[6], fields[7], socket.inet_aton(ip),
+                            b'\0' * 4, b'\0' * 4, fields[11], b'', b'') + MAGIC_COOKIE
+        for code, value in ((OPT_MESSAGE_TYPE, bytes([DHCPOFFER if message_type == DHCPDISCOVER else DHCPACK])),
+                            (OPT_SERVER_ID, socket.inet_aton(server_ip)),
+                            (OPT_LEASE_TIME, struct.pack('!I', lease_time)),
+                            (OPT_SUBNET_MASK, socket.inet_aton('255.255.255.0'))):
+            reply += bytes([code, len(value)]) + value
+        sock.sendto(reply + bytes([OPT_END]), (ciaddr if ciaddr != '0.0.0.0' else '255.255.255.255', CLIENT_PORT))
+    sock.close()
+
+
+def run(leases=6, lease_time=20):
+    """
+    Run the client against a stand-in server over a veth pair (needs root): bind
+    `leases` macvlans, survive a malformed broadcast reply, renew at T1 and release.
+    Returns True if every step passed.
+    """
+    host_if, server_if, server_ip = 'dhcptest0', 'dhcptest1', '10.250.0.1'
+    subprocess.run(['ip', 'link', 'add', host_if, 'type', 'veth', 'peer', 'name', server_if], check=True)
+    stop = threading.Event()
+    network = LinuxNetworkManager()
+    names = [f'dhcptest_v{i}' for i in range(leases)]
+    client = DHCPClient()
+    ok = True
+
+    def check(name, passed, detail=''):
+        nonlocal ok
+        ok = ok and passed
+        print(f"  [{'PASS' if passed else 'FAIL'}] {name}{': ' + str(detail) if detail else ''}")
+
+    try:
+        subprocess.run(['ip', 'addr', 'add', f'{server_ip}/24', 'dev', server_if], check=True)
+        for interface in (host_if, server_if):
+            subprocess.run(['ip', 'link', 'set', interface, 'up'], check=True)
+        log = []
+        threading.Thread(target=standin_server, args=(server_if, server_ip, lease_time, log, stop), daemon=True).start()
+        for i, name in enumerate(names):
+            network.create_macvlan(host_if, name, f'02:00:5e:10:00:{i:02x}')
+        # Client and server share this network namespace, so unicast between them would
+        # otherwise be dropped as coming from a local address
+        for interface in [server_if] + names:
+            with open(f'/proc/sys/net/ipv4/conf/{interface}/accept_local', 'w') as f:
+                f.write('1')
+
+        # Bind all leases at once
+        results = {}
+        threads = [threading.Thread(target=lambda n=n: results.__setitem__(n, client.acquire(n, timeout=10))) for n in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ips = [results.get(name) for name in names]
+        check(f'{leases} leases bound', all(ips) and len(set(ips)) == leases, ips)
+
+        # A reply with an empty message type option, broadcast like a rogue server would
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        sender.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, server_if.encode() + b'\0')
+        bad = BOOTP.pack(2, 1, 6, 0, 0, 0, 0, b'\0' * 4, b'\0' * 4, b'\0' * 4, b'\0' * 4, b'\0' * 16, b'', b'')
+        sender.sendto(bad + MAGIC_COOKIE + bytes([OPT_MESSAGE_TYPE, 0, OPT_END]), ('255.255.255.255', CLIENT_PORT))
+        sender.close()
+
+        # Renewal at T1 (half the lease) must extend every lease, which also shows the
+        # client's event loop survived the malformed reply
+        expiry = {lease['interface']: lease['expiresAt'] for lease in client.get_leases()}
+        time.sleep(lease_time * 0.5 + 3)
+        renewed = [lease for lease in client.get_leases()
+                   if lease['state'] == 'bound' and lease['expiresAt'] > expiry[lease['interface']]]
+        check('leases renewed at T1 after a malformed reply', len(renewed) == leases, f'{len(renewed)}/{leases}')
+        check('renewals unicast with ciaddr set', any(t == DHCPREQUEST and ciaddr != '0.0.0.0' for t, _, ciaddr in log))
+
+        for name in names:
+            client.release(name)
+        time.sleep(0.5)
+        releases = sum(1 for t, _, _ in log if t == DHCPRELEASE)
+        check('leases released', releases == leases and not client.get_leases(), f'{releases} DHCPRELEASE')
+    finally:
+        stop.set()
+        for name in names:
+            network.remove_interface(name)
+        subprocess.run(['ip', 'link', 'delete', host_if], check=False)
+    return ok
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Test the DHCP client against a stand-in server on a veth pair (root only)')
+    parser.add_argument('--leases', type=int, default=6)
+    parser.add_argument('--lease-time', type=int, default=20)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.leases, args.lease_time) else 1)